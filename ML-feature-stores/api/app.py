@@ -4,19 +4,23 @@ Serves equipment failure predictions in real-time
 """
 
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, Dict
-from contextlib import asynccontextmanager
+from typing import Optional, Dict, List, Tuple, Callable, Awaitable
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import pickle
+import copy
 import sys
 from pathlib import Path
 import logging
+from operator import itemgetter
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from feature_store.online_store import OnlineFeatureStore
-import pandas as pd
+from feature_store.online_store import AsyncOnlineFeatureStore
 import numpy as np
 
 logging.basicConfig(level=logging.INFO)
@@ -26,6 +30,91 @@ logger = logging.getLogger(__name__)
 model = None
 feature_store = None
 feature_names = None
+booster = None
+ort_session = None
+batch_scheduler = None
+
+# Model input layout (must match training column order)
+NUMERIC_FEATURES = (
+    'equipment_age_days',
+    'total_operating_hours',
+    'days_since_maintenance',
+    'maintenance_count_30d',
+    'failure_count_90d',
+    'avg_downtime_hours_90d',
+    'total_repair_cost_90d',
+    'avg_severity_score_90d',
+    'equipment_type_risk_score'
+)
+EQUIP_TYPES = ('Air Compressor', 'Centrifugal Pump', 'Electric Motor', 'HVAC System')
+AGE_CATS = ('aging', 'established')
+RISK_TIERS = ('aging_risk', 'high_risk', 'low_risk', 'medium_risk')
+
+FEATURE_NAMES = (
+    NUMERIC_FEATURES
+    + tuple(f'equipment_type_{et}' for et in EQUIP_TYPES)
+    + tuple(f'age_category_{ac}' for ac in AGE_CATS)
+    + tuple(f'risk_tier_{rt}' for rt in RISK_TIERS)
+)
+FEATURE_INDEX: Dict[str, int] = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+# Category value -> one-hot column index (one dict lookup per categorical)
+EQUIP_TYPE_IDX: Dict[str, int] = {et: FEATURE_INDEX[f'equipment_type_{et}'] for et in EQUIP_TYPES}
+AGE_CAT_IDX: Dict[str, int] = {ac: FEATURE_INDEX[f'age_category_{ac}'] for ac in AGE_CATS}
+RISK_TIER_IDX: Dict[str, int] = {rt: FEATURE_INDEX[f'risk_tier_{rt}'] for rt in RISK_TIERS}
+
+# Numeric features occupy the leading columns; pull them all in one C-level call
+NUMERIC_GET = itemgetter(*NUMERIC_FEATURES)
+NUMERIC_DEFAULTS: Dict[str, float] = {feat: 0 for feat in NUMERIC_FEATURES}
+
+# Probability cut-offs -> recommendation (tier i covers THRESHOLDS[i-1] <= p < THRESHOLDS[i])
+THRESHOLDS = np.array([0.2, 0.4, 0.7])
+RECOMMENDATIONS = (
+    "Continue normal operations, routine monitoring",
+    "Monitor closely, schedule routine maintenance",
+    "Schedule maintenance within 1 week",
+    "URGENT: Schedule immediate maintenance inspection"
+)
+
+
+def build_onnx_session(xgb_model, n_features: int, optimized_model_path: Optional[Path] = None):
+    """
+    Convert a fitted XGBClassifier to ONNX and open an ONNX Runtime session
+
+    Args:
+        xgb_model: Trained XGBClassifier
+        n_features: Width of the model input vector
+        optimized_model_path: Where ONNX Runtime writes the optimized graph (None = don't save)
+
+    Returns:
+        onnxruntime.InferenceSession tuned for single-request serving
+    """
+    import onnxmltools
+    from onnxmltools.convert.common.data_types import FloatTensorType
+    import onnxruntime as ort
+
+    # XGBoost 2.x keeps the pandas column names from training, but the ONNX
+    # converter only understands positional 'f0', 'f1', ... split features
+    xgb_model = copy.deepcopy(xgb_model)
+    xgb_model.get_booster().feature_names = None
+
+    initial_type = [('input', FloatTensorType([None, n_features]))]
+    onnx_model = onnxmltools.convert_xgboost(xgb_model, initial_types=initial_type)
+
+    sess_options = ort.SessionOptions()
+    sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    # Small tree ensemble on small batches - threading only adds overhead
+    sess_options.intra_op_num_threads = 1
+    sess_options.inter_op_num_threads = 1
+    sess_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    if optimized_model_path is not None:
+        sess_options.optimized_model_filepath = str(optimized_model_path)
+
+    return ort.InferenceSession(
+        onnx_model.SerializeToString(),
+        sess_options,
+        providers=['CPUExecutionProvider']
+    )
 
 
 @asynccontextmanager
@@ -35,7 +124,7 @@ async def lifespan(app: FastAPI):
     Runs on startup and shutdown
     """
     # Startup
-    global model, feature_store, feature_names
+    global model, feature_store, feature_names, booster, ort_session, batch_scheduler
     
     logger.info("="*70)
     logger.info("STARTING INFERENCE API")
@@ -43,8 +132,8 @@ async def lifespan(app: FastAPI):
     
     # Initialize online feature store
     logger.info("1. Connecting to online feature store (Redis)...")
-    feature_store = OnlineFeatureStore()
-    stats = feature_store.get_store_stats()
+    feature_store = AsyncOnlineFeatureStore()
+    stats = await feature_store.get_store_stats()
     logger.info(f"   ✅ Connected to Redis")
     logger.info(f"   Equipment available: {stats['equipment_count']}")
     
@@ -68,14 +157,22 @@ async def lifespan(app: FastAPI):
             if len(runs) > 0:
                 run_id = runs.iloc[0]['run_id']
                 
-                # Download model artifact
+                # Load the model logged with the MLflow XGBoost flavor
+                import mlflow.xgboost
+                model = mlflow.xgboost.load_model(f"runs:/{run_id}/model")
                 client = mlflow.tracking.MlflowClient()
-                local_path = client.download_artifacts(run_id, "model/model.pkl")
-                
-                with open(local_path, 'rb') as f:
-                    model = pickle.load(f)
                 
                 logger.info(f"   ✅ Model loaded from run: {run_id[:8]}")
+                
+                # Check the training encoder against the serving one-hot layout
+                try:
+                    encoder_path = client.download_artifacts(run_id, "model/encoder.pkl")
+                    with open(encoder_path, 'rb') as f:
+                        encoder = pickle.load(f)
+                    if not encoder_matches_layout(encoder):
+                        logger.warning("   ⚠️  Training categories differ from the serving one-hot layout")
+                except Exception as e:
+                    logger.warning(f"   ⚠️  Could not check training encoder: {e}")
             else:
                 logger.warning("   ⚠️  No trained models found")
         else:
@@ -87,28 +184,34 @@ async def lifespan(app: FastAPI):
         import xgboost as xgb
         model = xgb.XGBClassifier()
     
-    # Define expected feature names (must match training)
-    feature_names = [
-        'equipment_age_days',
-        'total_operating_hours',
-        'days_since_maintenance',
-        'maintenance_count_30d',
-        'failure_count_90d',
-        'avg_downtime_hours_90d',
-        'total_repair_cost_90d',
-        'avg_severity_score_90d',
-        'equipment_type_risk_score',
-        'equipment_type_Air Compressor',
-        'equipment_type_Centrifugal Pump',
-        'equipment_type_Electric Motor',
-        'equipment_type_HVAC System',
-        'age_category_aging',
-        'age_category_established',
-        'risk_tier_aging_risk',
-        'risk_tier_high_risk',
-        'risk_tier_low_risk',
-        'risk_tier_medium_risk'
-    ]
+    # Expected feature names (must match training)
+    feature_names = list(FEATURE_NAMES)
+    
+    # Cache the native booster so requests skip the sklearn wrapper and DMatrix build
+    booster = None
+    try:
+        booster = model.get_booster()
+        if booster.feature_names and list(booster.feature_names) != feature_names:
+            logger.warning("   ⚠️  Model feature names do not match the serving feature layout")
+    except Exception as e:
+        logger.warning(f"   ⚠️  Model booster unavailable: {e}")
+    
+    # Compile model to ONNX Runtime (avoids pandas + XGBoost dispatch per request)
+    logger.info("\n3. Compiling model to ONNX Runtime...")
+    try:
+        ort_session = build_onnx_session(
+            model,
+            len(feature_names),
+            optimized_model_path=Path(__file__).parent / "model_opt.onnx"
+        )
+        logger.info("   ✅ ONNX Runtime session ready")
+    except Exception as e:
+        ort_session = None
+        logger.warning(f"   ⚠️  ONNX conversion unavailable, serving with XGBoost: {e}")
+    
+    # Coalesce concurrent /predict calls into batched model invocations
+    batch_scheduler = BatchScheduler(predict_equipment_batch)
+    batch_scheduler.start()
     
     logger.info("\n" + "="*70)
     logger.info("✅ INFERENCE API READY")
@@ -118,12 +221,179 @@ async def lifespan(app: FastAPI):
     logger.info("  GET  /health        - Health check")
     logger.info("  POST /predict       - Failure prediction")
     logger.info("  GET  /features/{id} - Get equipment features")
+    logger.info("  GET  /admin/stats   - Full feature store statistics")
+    logger.info("  POST /features/{id}/invalidate - Drop cached features")
     logger.info("="*70 + "\n")
     
     yield  # Server runs here
     
     # Shutdown
     logger.info("Shutting down API...")
+    await batch_scheduler.stop()
+    await feature_store.close()
+
+
+def encoder_matches_layout(encoder) -> bool:
+    """
+    Check a fitted training OneHotEncoder against the serving category layout
+    
+    Args:
+        encoder: OneHotEncoder logged by the training pipeline
+    """
+    categories = [tuple(c) for c in encoder.categories_]
+    return categories == [EQUIP_TYPES, AGE_CATS, RISK_TIERS]
+
+
+def fill_feature_row(features: Dict, x: np.ndarray):
+    """
+    Write one equipment's features into a zeroed model input row
+    
+    Args:
+        features: Feature dictionary from the online store
+        x: 1-D float32 row laid out in FEATURE_NAMES order
+    """
+    # Numeric features (missing values default to 0)
+    x[:len(NUMERIC_FEATURES)] = NUMERIC_GET({**NUMERIC_DEFAULTS, **features})
+    
+    # One-hot encode categorical features (unknown values leave all zeros)
+    i = EQUIP_TYPE_IDX.get(features.get('equipment_type'))
+    if i is not None:
+        x[i] = 1
+    i = AGE_CAT_IDX.get(features.get('age_category'))
+    if i is not None:
+        x[i] = 1
+    i = RISK_TIER_IDX.get(features.get('risk_tier'))
+    if i is not None:
+        x[i] = 1
+
+
+def predict_batch(X: np.ndarray) -> np.ndarray:
+    """
+    Score a (B, n_features) matrix in a single model call
+    
+    Returns:
+        Array of B failure probabilities (0-1)
+    """
+    try:
+        if ort_session is not None:
+            return ort_session.run(['probabilities'], {'input': X})[0][:, 1]
+        if booster is not None:
+            # binary:logistic returns the positive-class probability per row;
+            # column order is fixed by FEATURE_NAMES and checked at startup
+            return booster.inplace_predict(X, validate_features=False)
+    except Exception as e:
+        logger.error(f"Prediction error: {e}")
+    
+    # No model (demo) or inference failure: rule-based prediction
+    return np.minimum(X[:, FEATURE_INDEX['failure_count_90d']] * 0.3, 1.0)
+
+
+async def predict_equipment_batch(equipment_ids: List[str]) -> List:
+    """
+    Fetch features and score a batch of equipment
+    
+    Features for the whole batch come from one Redis round-trip and are
+    scored with one model call in the threadpool.
+    
+    Returns:
+        One entry per equipment_id: (features, probability, recommendation),
+        (None, None, None) if the equipment is not in the feature store, or
+        the exception raised while preparing its features
+    """
+    features_list = await feature_store.get_features_many(equipment_ids)
+    results: List = [(None, None, None)] * len(equipment_ids)
+    
+    X = np.zeros((len(equipment_ids), len(FEATURE_NAMES)), dtype=np.float32)
+    scored = []
+    for i, features in enumerate(features_list):
+        if features is None:
+            continue
+        try:
+            fill_feature_row(features, X[i])
+            scored.append(i)
+        except Exception as e:
+            results[i] = e
+    
+    if scored:
+        # Inference is CPU-bound (ONNX Runtime/XGBoost release the GIL), so keep it off the event loop
+        probabilities = await run_in_threadpool(predict_batch, X[scored])
+        tiers = np.searchsorted(THRESHOLDS, probabilities, side='right')
+        for i, probability, tier in zip(scored, probabilities, tiers):
+            results[i] = (features_list[i], float(probability), RECOMMENDATIONS[tier])
+    
+    return results
+
+
+class BatchScheduler:
+    """
+    Micro-batches concurrent requests into one batch call
+    
+    Items submitted within a short window are handed to process_fn together,
+    amortizing per-call Redis and model overhead across the batch.
+    """
+    
+    def __init__(self, process_fn: Callable[[List], Awaitable[List]],
+                 max_batch: int = 64, max_wait_seconds: float = 0.003):
+        self.process_fn = process_fn
+        self.max_batch = max_batch
+        self.max_wait_seconds = max_wait_seconds
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the background batching loop (call from a running event loop)"""
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Cancel the batching loop"""
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+    
+    async def submit(self, item):
+        """
+        Queue one item and wait for its result
+        
+        Raises:
+            The exception process_fn returned or raised for this item
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            # Block for the first request, then collect more until the window closes
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_seconds
+            
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            items, futures = zip(*batch)
+            
+            try:
+                results = await self.process_fn(list(items))
+            except Exception as e:
+                results = [e] * len(futures)
+            
+            for future, result in zip(futures, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
 
 
 # Initialize FastAPI app with lifespan
@@ -183,19 +453,21 @@ async def root():
         "endpoints": {
             "health": "/health",
             "predict": "/predict (POST)",
-            "features": "/features/{equipment_id} (GET)"
+            "features": "/features/{equipment_id} (GET)",
+            "invalidate": "/features/{equipment_id}/invalidate (POST)",
+            "stats": "/admin/stats (GET)"
         }
     }
 
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (PING + store stats cached for a few seconds)"""
     
     # Check Redis connection
     redis_ok = False
     try:
-        feature_store.redis_client.ping()
+        await feature_store.async_redis_client.ping()
         redis_ok = True
     except:
         pass
@@ -209,14 +481,21 @@ async def health_check():
         "status": status,
         "redis_connected": redis_ok,
         "model_loaded": model_ok,
-        "equipment_available": feature_store.get_store_stats()['equipment_count'] if redis_ok else 0
+        "equipment_available": (await feature_store.get_store_stats_cached())['equipment_count'] if redis_ok else 0
     }
 
 
+@app.get("/admin/stats")
+async def store_stats():
+    """Recompute full online store statistics (scans Redis keys)"""
+    # ttl_seconds=0 forces a recompute and refreshes the /health cache
+    return await feature_store.get_store_stats_cached(ttl_seconds=0)
+
+
 @app.get("/features/{equipment_id}")
 async def get_features(equipment_id: str):
     """Get features for equipment from online store"""
-    features = feature_store.get_features(equipment_id)
+    features = await feature_store.get_features(equipment_id)
     
     if features is None:
         raise HTTPException(
@@ -230,7 +509,23 @@ async def get_features(equipment_id: str):
     }
 
 
-@app.post("/predict", response_model=PredictionResponse)
+@app.post("/features/{equipment_id}/invalidate")
+async def invalidate_features(equipment_id: str):
+    """Drop cached features so the next read goes to Redis (call after writes)"""
+    feature_store.invalidate_features(equipment_id)
+    
+    return {
+        "equipment_id": equipment_id,
+        "invalidated": True
+    }
+
+
+@app.post(
+    "/predict",
+    response_class=ORJSONResponse,
+    response_model=None,
+    responses={200: {"model": PredictionResponse}}  # Documented, not re-validated per request
+)
 async def predict(request: PredictionRequest):
     """
     Predict equipment failure probability
@@ -242,54 +537,12 @@ async def predict(request: PredictionRequest):
     """
     equipment_id = request.equipment_id
     
-    # 1. Get features from Redis
+    # 1-4. Get features from Redis, predict and recommend (batched with concurrent
+    #      requests into one Redis round-trip and one model call)
     logger.info(f"Prediction request for {equipment_id}")
     
-    features = feature_store.get_features(equipment_id)
-    
-    if features is None:
-        raise HTTPException(
-            status_code=404,
-            detail=f"Equipment '{equipment_id}' not found. Available equipment: {feature_store.list_available_equipment()}"
-        )
-    
-    # 2. Prepare features for model
     try:
-        # Create feature vector matching training format
-        feature_dict = {}
-        
-        # Numeric features
-        numeric_features = [
-            'equipment_age_days', 'total_operating_hours', 
-            'days_since_maintenance', 'maintenance_count_30d',
-            'failure_count_90d', 'avg_downtime_hours_90d',
-            'total_repair_cost_90d', 'avg_severity_score_90d',
-            'equipment_type_risk_score'
-        ]
-        
-        for feat in numeric_features:
-            feature_dict[feat] = features.get(feat, 0)
-        
-        # One-hot encode categorical features
-        equipment_type = features.get('equipment_type', '')
-        age_category = features.get('age_category', '')
-        risk_tier = features.get('risk_tier', '')
-        
-        # Equipment type one-hot
-        for et in ['Air Compressor', 'Centrifugal Pump', 'Electric Motor', 'HVAC System']:
-            feature_dict[f'equipment_type_{et}'] = 1 if equipment_type == et else 0
-        
-        # Age category one-hot
-        for ac in ['aging', 'established']:
-            feature_dict[f'age_category_{ac}'] = 1 if age_category == ac else 0
-        
-        # Risk tier one-hot
-        for rt in ['aging_risk', 'high_risk', 'low_risk', 'medium_risk']:
-            feature_dict[f'risk_tier_{rt}'] = 1 if risk_tier == rt else 0
-        
-        # Create DataFrame with correct column order
-        X = pd.DataFrame([feature_dict])[feature_names]
-        
+        features, probability, recommendation = await batch_scheduler.submit(equipment_id)
     except Exception as e:
         logger.error(f"Feature preparation error: {e}")
         raise HTTPException(
@@ -297,45 +550,27 @@ async def predict(request: PredictionRequest):
             detail=f"Error preparing features: {str(e)}"
         )
     
-    # 3. Make prediction
-    try:
-        if hasattr(model, 'predict_proba'):
-            probability = float(model.predict_proba(X)[0, 1])
-        else:
-            # Dummy prediction for demo
-            probability = float(features.get('failure_count_90d', 0)) * 0.3
-            probability = min(probability, 1.0)
-        
-    except Exception as e:
-        logger.error(f"Prediction error: {e}")
-        # Fallback: use rule-based prediction
-        failure_count = features.get('failure_count_90d', 0)
-        probability = min(failure_count * 0.3, 1.0)
-    
-    # 4. Generate recommendation
-    if probability >= 0.7:
-        recommendation = "URGENT: Schedule immediate maintenance inspection"
-    elif probability >= 0.4:
-        recommendation = "Schedule maintenance within 1 week"
-    elif probability >= 0.2:
-        recommendation = "Monitor closely, schedule routine maintenance"
-    else:
-        recommendation = "Continue normal operations, routine monitoring"
-    
-    # 5. Return response
-    return PredictionResponse(
-        equipment_id=equipment_id,
-        failure_probability=round(probability, 3),
-        risk_tier=features.get('risk_tier', 'unknown'),
-        recommendation=recommendation,
-        features_used={
+    if features is None:
+        available = await feature_store.list_available_equipment()
+        raise HTTPException(
+            status_code=404,
+            detail=f"Equipment '{equipment_id}' not found. Available equipment: {available}"
+        )
+    
+    # 4. Return response (recommendation was assigned per batch from THRESHOLDS)
+    return ORJSONResponse({
+        'equipment_id': equipment_id,
+        'failure_probability': round(probability, 3),
+        'risk_tier': features.get('risk_tier', 'unknown'),
+        'recommendation': recommendation,
+        'features_used': {
             'equipment_age_days': features.get('equipment_age_days'),
             'failure_count_90d': features.get('failure_count_90d'),
             'days_since_maintenance': features.get('days_since_maintenance'),
             'equipment_type': features.get('equipment_type'),
             'risk_tier': features.get('risk_tier')
         }
-    )
+    })
 
 
 if __name__ == "__main__":
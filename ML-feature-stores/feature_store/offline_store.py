@@ -3,9 +3,9 @@ Offline Feature Store
 Exports features from PostgreSQL to Parquet files for ML training
 """
 
-import psycopg2
 import pandas as pd
 import duckdb
+import os
 from pathlib import Path
 from datetime import datetime, date
 import logging
@@ -33,8 +33,25 @@ class OfflineFeatureStore:
             'password': 'pipeline_pass'
         }
         
+        # Persistent DuckDB connection so the Parquet metadata cache survives across queries
+        self._duck = duckdb.connect(':memory:')
+        self._duck.execute("PRAGMA enable_object_cache=true")
+        self._duck.execute(f"PRAGMA threads={os.cpu_count() or 1}")
+        
         logger.info(f"Offline feature store initialized at {self.base_path}")
     
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Close the DuckDB connection"""
+        if self._duck is not None:
+            self._duck.close()
+            self._duck = None
+    
     def export_features(self, feature_date: date = None):
         """
         Export features from PostgreSQL to Parquet
@@ -47,12 +64,12 @@ class OfflineFeatureStore:
         
         logger.info(f"Exporting features for date: {feature_date}")
         
-        # Connect to PostgreSQL
-        conn = psycopg2.connect(**self.pg_conn_params)
+        # Create date-partitioned directory
+        partition_path = self.base_path / "equipment_features" / f"date={feature_date}"
+        partition_path.mkdir(parents=True, exist_ok=True)
+        output_file = partition_path / "features.parquet"
         
-        # Read features into pandas
-        query = """
-        SELECT 
+        columns = """
             equipment_id,
             equipment_type,
             location,
@@ -71,27 +88,71 @@ class OfflineFeatureStore:
             risk_tier,
             feature_date,
             feature_timestamp
-        FROM features.batch_equipment_features
         """
         
-        df = pd.read_sql(query, conn)
-        conn.close()
+        # Stream PostgreSQL -> Parquet inside DuckDB (no pandas materialization)
+        con = self._duck
+        pg = self.pg_conn_params
         
-        logger.info(f"Read {len(df)} feature records from PostgreSQL")
+        try:
+            con.execute("INSTALL postgres; LOAD postgres;")
+            scanner_available = True
+        except duckdb.Error as e:
+            # Extension unavailable (e.g. no network for INSTALL): fetch Arrow over ADBC instead
+            logger.warning(f"DuckDB postgres extension unavailable, exporting via ADBC: {e}")
+            scanner_available = False
         
-        # Create date-partitioned directory
-        partition_path = self.base_path / "equipment_features" / f"date={feature_date}"
-        partition_path.mkdir(parents=True, exist_ok=True)
+        if scanner_available:
+            con.execute(f"""
+                ATTACH IF NOT EXISTS 'host={pg['host']} port={pg['port']} dbname={pg['dbname']} user={pg['user']} password={pg['password']}'
+                AS pg (TYPE POSTGRES, READ_ONLY)
+            """)
+            source_table = "pg.features.batch_equipment_features"
+        else:
+            con.register(
+                'adbc_features',
+                self._fetch_arrow(f"SELECT {columns} FROM features.batch_equipment_features")
+            )
+            source_table = "adbc_features"
         
-        # Export to Parquet
-        output_file = partition_path / "features.parquet"
-        df.to_parquet(output_file, compression='snappy', index=False)
+        query = f"""
+        SELECT {columns}
+        FROM {source_table}
+        ORDER BY equipment_id
+        """
         
-        logger.info(f"✅ Exported {len(df)} records to {output_file}")
+        # Export to Parquet: zstd, 64k-row groups (strings are dictionary-encoded by default).
+        # Sorting by equipment_id keeps row-group min/max tight for the IN filter in get_features
+        con.execute(f"""
+            COPY ({query}) TO '{output_file}'
+            (FORMAT PARQUET, COMPRESSION 'zstd', COMPRESSION_LEVEL 3, ROW_GROUP_SIZE 64000)
+        """)
+        
+        record_count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{output_file}')").fetchone()[0]
+        if not scanner_available:
+            con.unregister('adbc_features')
+        
+        logger.info(f"✅ Exported {record_count} records to {output_file}")
         logger.info(f"   File size: {output_file.stat().st_size / 1024:.2f} KB")
         
         return output_file
     
+    def _fetch_arrow(self, query: str):
+        """
+        Run a query on PostgreSQL and return the result as an Arrow table
+        
+        Uses the ADBC driver, which fills Arrow buffers directly (no pandas
+        dtype inference or per-value Python objects).
+        """
+        import adbc_driver_postgresql.dbapi as adbc_pg
+        
+        pg = self.pg_conn_params
+        uri = f"postgresql://{pg['user']}:{pg['password']}@{pg['host']}:{pg['port']}/{pg['dbname']}"
+        
+        with adbc_pg.connect(uri) as conn, conn.cursor() as cur:
+            cur.execute(query)
+            return cur.fetch_arrow_table()
+    
     def get_features(self, 
                      equipment_ids: list = None, 
                      as_of_date: date = None,
@@ -107,14 +168,32 @@ class OfflineFeatureStore:
         Returns:
             DataFrame with requested features
         """
+        # Only open partitions that can contain rows on/before as_of_date
+        files = self._partition_files(as_of_date)
+        if not files:
+            logger.info("Retrieved 0 feature records (no matching partitions)")
+            return pd.DataFrame()
+        
         # Use DuckDB to query Parquet files
-        con = duckdb.connect(':memory:')
+        con = self._duck
         
-        # Build query
-        table_path = str(self.base_path / "equipment_features" / "*" / "*.parquet")
+        table_sql = "read_parquet([" + ", ".join(f"'{f}'" for f in files) + "])"
+        
+        # Project only requested columns so DuckDB skips decoding the rest
+        if feature_names:
+            available = set(con.execute(f"DESCRIBE SELECT * FROM {table_sql}").df()['column_name'])
+            output_cols = ['equipment_id'] + [
+                c for c in feature_names if c in available and c != 'equipment_id'
+            ]
+            scan_cols = output_cols + (['feature_date'] if 'feature_date' not in output_cols else [])
+        else:
+            output_cols = None
+            scan_cols = None
+        
+        select_sql = ', '.join(f'"{c}"' for c in scan_cols) if scan_cols else '*'
         
         # Start with base query
-        query_parts = [f"SELECT * FROM read_parquet('{table_path}')"]
+        query_parts = [f"SELECT {select_sql} FROM {table_sql}"]
         
         # Add filters
         filters = []
@@ -133,36 +212,53 @@ class OfflineFeatureStore:
         base_query = ' '.join(query_parts)
         
         # Get latest features per equipment (point-in-time)
+        final_select = ', '.join(f'"{c}"' for c in output_cols) if output_cols else '*'
         query = f"""
-        WITH base_features AS (
+        SELECT {final_select} FROM (
             {base_query}
-        ),
-        ranked_features AS (
-            SELECT *,
-                ROW_NUMBER() OVER (
-                    PARTITION BY equipment_id 
-                    ORDER BY feature_date DESC
-                ) as rn
-            FROM base_features
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY equipment_id 
+                ORDER BY feature_date DESC
+            ) = 1
         )
-        SELECT * EXCLUDE (rn) FROM ranked_features WHERE rn = 1
         """
         
         # Execute query
         df = con.execute(query).df()
-        con.close()
-        
-        # Select specific columns if requested
-        if feature_names:
-            available_cols = [c for c in feature_names if c in df.columns]
-            if 'equipment_id' not in available_cols:
-                available_cols = ['equipment_id'] + available_cols
-            df = df[available_cols]
         
         logger.info(f"Retrieved {len(df)} feature records")
         
         return df
     
+    def _partition_files(self, as_of_date: date = None) -> list:
+        """
+        List Parquet files in date partitions on/before as_of_date
+        
+        Args:
+            as_of_date: Latest partition date to include (None = all)
+        
+        Returns:
+            Sorted list of Parquet file paths
+        """
+        equipment_path = self.base_path / "equipment_features"
+        
+        if not equipment_path.exists():
+            return []
+        
+        files = []
+        for date_dir in sorted(equipment_path.iterdir()):
+            if not (date_dir.is_dir() and date_dir.name.startswith('date=')):
+                continue
+            
+            if as_of_date:
+                partition_date = date.fromisoformat(date_dir.name.replace('date=', ''))
+                if partition_date > as_of_date:
+                    continue
+            
+            files.extend(str(f) for f in sorted(date_dir.glob("*.parquet")))
+        
+        return files
+    
     def list_feature_dates(self) -> list:
         """List all available feature dates"""
         equipment_path = self.base_path / "equipment_features"
@@ -180,7 +276,7 @@ class OfflineFeatureStore:
     
     def get_feature_stats(self) -> dict:
         """Get statistics about the offline feature store"""
-        con = duckdb.connect(':memory:')
+        con = self._duck
         
         table_path = str(self.base_path / "equipment_features" / "*" / "*.parquet")
         
@@ -196,7 +292,6 @@ class OfflineFeatureStore:
             """
             
             result = con.execute(stats_query).fetchone()
-            con.close()
             
             return {
                 'total_records': result[0],
@@ -206,7 +301,6 @@ class OfflineFeatureStore:
                 'latest_date': result[4]
             }
         except:
-            con.close()
             return {
                 'total_records': 0,
                 'unique_equipment': 0,
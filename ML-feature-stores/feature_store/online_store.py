@@ -4,10 +4,17 @@ Stores latest features in Redis for real-time inference
 """
 
 import redis
-import json
-import psycopg2
-from datetime import datetime
+import redis.asyncio
+import asyncio
+import asyncpg
+import functools
+import cachetools
+import msgpack
+import time
+from datetime import date, datetime
+from decimal import Decimal
 from typing import Dict, List, Optional
+import socket
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -18,15 +25,99 @@ class OnlineFeatureStore:
     """
     Manages online features stored in Redis
     Provides sub-10ms feature retrieval for real-time inference
+    
+    Each equipment is a Redis hash keyed by short field aliases (FIELD_ALIAS)
+    with MessagePack-encoded values; SCHEMA_KEY maps aliases back to names.
     """
     
-    def __init__(self, redis_host: str = 'localhost', redis_port: int = 6379):
-        """Initialize Redis connection"""
+    # Columns materialized from features.batch_equipment_features
+    _FEATURE_COLUMNS = (
+        'equipment_id',
+        'equipment_type',
+        'location',
+        'manufacturer',
+        'age_category',
+        'equipment_age_days',
+        'total_operating_hours',
+        'days_since_maintenance',
+        'maintenance_count_30d',
+        'failure_count_90d',
+        'avg_downtime_hours_90d',
+        'total_repair_cost_90d',
+        'avg_severity_score_90d',
+        'equipment_type_risk_score',
+        'risk_tier',
+        'feature_date',
+        'feature_timestamp'
+    )
+    
+    # Server-side conversions so rows arrive as MessagePack-native types
+    # (no per-value Decimal/datetime handling in Python)
+    _COLUMN_SQL = {
+        'avg_downtime_hours_90d': 'avg_downtime_hours_90d::float8',
+        'total_repair_cost_90d': 'total_repair_cost_90d::float8',
+        'avg_severity_score_90d': 'avg_severity_score_90d::float8',
+        'equipment_type_risk_score': 'equipment_type_risk_score::float8',
+        'feature_date': "TO_CHAR(feature_date, 'YYYY-MM-DD')",
+        'feature_timestamp': """TO_CHAR(feature_timestamp, 'YYYY-MM-DD"T"HH24:MI:SS')"""
+    }
+    
+    # Feature name -> Redis hash field (full names would repeat in every key)
+    FIELD_ALIAS = {
+        'equipment_id': 'id',
+        'equipment_type': 'et',
+        'location': 'lo',
+        'manufacturer': 'mf',
+        'age_category': 'ac',
+        'equipment_age_days': 'ad',
+        'total_operating_hours': 'oh',
+        'days_since_maintenance': 'dm',
+        'maintenance_count_30d': 'mc',
+        'failure_count_90d': 'fc',
+        'avg_downtime_hours_90d': 'dh',
+        'total_repair_cost_90d': 'rc',
+        'avg_severity_score_90d': 'ss',
+        'equipment_type_risk_score': 'rs',
+        'risk_tier': 'rt',
+        'feature_date': 'fd',
+        'feature_timestamp': 'ft',
+        '_updated_at': 'ua',
+        '_source': 'sr'
+    }
+    FIELD_NAME = {alias: name for name, alias in FIELD_ALIAS.items()}
+    SCHEMA_KEY = "feature_schema:equipment"
+    KEY_PREFIX = "equipment:"
+    KEY_PATTERN = KEY_PREFIX + "*"
+    SCAN_COUNT = 1000
+    UNLINK_BATCH = 500
+    
+    def __init__(self, redis_host: str = 'localhost', redis_port: int = 6379,
+                 cache_size: int = 4096, cache_ttl_seconds: float = 5,
+                 max_connections: int = 32):
+        """
+        Initialize Redis connection
+        
+        Args:
+            max_connections: Size of the Redis connection pool
+            cache_size: Max decoded feature dicts kept in-process
+            cache_ttl_seconds: How long a cached feature dict is served without Redis
+        """
+        # Keepalive stops idle pooled connections being dropped and reopened;
+        # redis-py already sets TCP_NODELAY on every connection
+        self.redis_params = {
+            'host': redis_host,
+            'port': redis_port,
+            'db': 0,
+            'decode_responses': False,  # Feature values are MessagePack bytes
+            'socket_keepalive': True,
+            'socket_keepalive_options': (
+                {socket.TCP_KEEPIDLE: 60} if hasattr(socket, 'TCP_KEEPIDLE') else {}
+            ),
+            'retry_on_timeout': True
+        }
+        self.max_connections = max_connections
         self.redis_client = redis.Redis(
-            host=redis_host,
-            port=redis_port,
-            db=0,
-            decode_responses=True  # Automatically decode bytes to strings
+            connection_pool=redis.ConnectionPool(max_connections=max_connections, **self.redis_params)
         )
         
         # Test connection
@@ -45,8 +136,114 @@ class OnlineFeatureStore:
             'user': 'pipeline_user',
             'password': 'pipeline_pass'
         }
+        
+        # (computed_at, stats) for get_store_stats_cached
+        self._stats_cache = (0.0, None)
+        
+        # In-process cache of decoded features for hot equipment IDs
+        self._cache = cachetools.TTLCache(maxsize=cache_size, ttl=cache_ttl_seconds)
+    
+    @classmethod
+    def _key(cls, equipment_id: str) -> str:
+        """Redis key for an equipment's features"""
+        return cls.KEY_PREFIX + equipment_id
+    
+    @staticmethod
+    def _encode_value(value):
+        """MessagePack fallback for PostgreSQL types it can't pack natively"""
+        if isinstance(value, Decimal):
+            return float(value)
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        raise TypeError(f"Cannot serialize {type(value).__name__}")
+    
+    @classmethod
+    def _encode(cls, features: Dict) -> Dict[str, bytes]:
+        """Encode a feature dict as a Redis hash mapping (alias -> MessagePack value)"""
+        return {
+            cls.FIELD_ALIAS.get(name, name): msgpack.packb(value, default=cls._encode_value, use_bin_type=True)
+            for name, value in features.items()
+        }
+    
+    @classmethod
+    def _decode(cls, data) -> Optional[Dict]:
+        """Decode an HGETALL result (None if missing)"""
+        if not data:
+            return None
+        return {
+            cls.FIELD_NAME.get(field.decode(), field.decode()): msgpack.unpackb(value, raw=False)
+            for field, value in data.items()
+        }
+    
+    @classmethod
+    def _equipment_id(cls, key) -> str:
+        """Equipment ID from a Redis key (bytes or str)"""
+        if isinstance(key, bytes):
+            key = key.decode()
+        return key[len(cls.KEY_PREFIX):]  # scan matched the prefix, so slice instead of replace
+    
+    def _split_cached(self, equipment_ids: List[str]):
+        """
+        Look equipment up in the in-process cache
+        
+        Returns:
+            (results with cache hits filled in, indices still to fetch)
+        """
+        results = [self._cache.get(eq_id) for eq_id in equipment_ids]
+        missing = [i for i, features in enumerate(results) if features is None]
+        return results, missing
+    
+    def _fill_cached(self, equipment_ids: List[str], results: List, missing: List[int], values: List):
+        """Decode fetched values into results and cache the ones found"""
+        for i, value in zip(missing, values):
+            features = self._decode(value)
+            if features is not None:
+                self._cache[equipment_ids[i]] = features
+            results[i] = features
+    
+    def invalidate_features(self, equipment_id: Optional[str] = None):
+        """
+        Drop cached features so the next read goes to Redis
+        
+        Args:
+            equipment_id: Equipment to invalidate (None = all)
+        """
+        if equipment_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(equipment_id, None)
     
-    def materialize_batch_features(self, ttl_seconds: int = 86400):
+    @classmethod
+    def _materialize_query(cls, columns: Optional[List[str]] = None):
+        """
+        Build the materialization SELECT for an allowlisted column subset
+        
+        Returns:
+            (query, selected column names); equipment_id is always included
+        """
+        if columns is None:
+            selected = cls._FEATURE_COLUMNS
+        else:
+            unknown = set(columns) - set(cls._FEATURE_COLUMNS)
+            if unknown:
+                raise ValueError(f"Unknown feature columns: {sorted(unknown)}")
+            selected = ('equipment_id',) + tuple(
+                c for c in cls._FEATURE_COLUMNS if c in columns and c != 'equipment_id'
+            )
+        
+        select_list = ', '.join(
+            f"{cls._COLUMN_SQL[c]} AS {c}" if c in cls._COLUMN_SQL else c
+            for c in selected
+        )
+        query = (
+            f"SELECT {select_list} "
+            f"FROM features.batch_equipment_features "
+            f"ORDER BY equipment_id"
+        )
+        return query, selected
+    
+    def materialize_batch_features(self, ttl_seconds: int = 86400, chunk_size: int = 1000,
+                                   columns: Optional[List[str]] = None):
         """
         Materialize (sync) batch features from PostgreSQL to Redis
         
@@ -55,77 +252,103 @@ class OnlineFeatureStore:
         
         Args:
             ttl_seconds: Time-to-live for features in Redis (default 24 hours)
+            chunk_size: Rows queued per Redis pipeline flush
+            columns: Feature columns to materialize (None = all)
+        
+        Returns:
+            Number of features materialized
+        """
+        return asyncio.run(self.materialize_batch_features_async(ttl_seconds, chunk_size, columns=columns))
+    
+    async def materialize_batch_features_async(self, ttl_seconds: int = 86400, chunk_size: int = 1000,
+                                               queue_size: int = 2000,
+                                               columns: Optional[List[str]] = None):
+        """
+        Materialize batch features with PostgreSQL reads and Redis writes overlapped
+        
+        A producer streams rows from an asyncpg cursor into a bounded queue while
+        a consumer encodes them and flushes Redis pipelines, so wall time is
+        roughly max(read, write) instead of their sum.
+        
+        Args:
+            ttl_seconds: Time-to-live for features in Redis (default 24 hours)
+            chunk_size: Rows queued per Redis pipeline flush
+            queue_size: Max rows buffered between PostgreSQL and Redis (in whole chunks)
+            columns: Feature columns to materialize (None = all)
         
         Returns:
             Number of features materialized
         """
         logger.info("Starting batch feature materialization to Redis...")
         
-        # Connect to PostgreSQL
-        conn = psycopg2.connect(**self.pg_conn_params)
-        cur = conn.cursor()
-        
-        # Read latest batch features
-        query = """
-        SELECT 
-            equipment_id,
-            equipment_type,
-            location,
-            manufacturer,
-            age_category,
-            equipment_age_days,
-            total_operating_hours,
-            days_since_maintenance,
-            maintenance_count_30d,
-            failure_count_90d,
-            avg_downtime_hours_90d,
-            total_repair_cost_90d,
-            avg_severity_score_90d,
-            equipment_type_risk_score,
-            risk_tier,
-            feature_date,
-            feature_timestamp
-        FROM features.batch_equipment_features
-        """
-        
-        cur.execute(query)
-        rows = cur.fetchall()
-        columns = [desc[0] for desc in cur.description]
-        
-        logger.info(f"Read {len(rows)} equipment feature records from PostgreSQL")
-        
-        # Materialize to Redis
-        pipeline = self.redis_client.pipeline()
-        materialized_count = 0
-        
-        for row in rows:
-            # Convert row to dictionary
-            features = dict(zip(columns, row))
-            equipment_id = features['equipment_id']
-            
-            # Convert datetime/date objects to strings for JSON
-            for key, value in features.items():
-                if isinstance(value, (datetime, )):
-                    features[key] = value.isoformat()
-            
-            # Add metadata
-            features['_updated_at'] = datetime.now().isoformat()
-            features['_source'] = 'batch_features'
-            
-            # Store in Redis with key pattern: equipment:{equipment_id}
-            key = f"equipment:{equipment_id}"
-            pipeline.setex(
-                key,
-                ttl_seconds,
-                json.dumps(features, default=str)
+        # Only fetch the columns being served (validated against the allowlist)
+        query, selected = self._materialize_query(columns)
+        
+        # The queue carries chunks of rows, not single rows
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size // chunk_size))
+        
+        # Per-run constants: hash field per selected column, and the metadata
+        # fields (shared by every record) encoded once
+        aliases = [self.FIELD_ALIAS.get(c, c) for c in selected]
+        metadata_fields = self._encode({
+            '_updated_at': datetime.now().isoformat(),
+            '_source': 'batch_features'
+        })
+        pack = functools.partial(msgpack.packb, default=self._encode_value, use_bin_type=True)
+        
+        async def read_postgres():
+            pg = self.pg_conn_params
+            conn = await asyncpg.connect(
+                host=pg['host'],
+                port=pg['port'],
+                database=pg['dbname'],
+                user=pg['user'],
+                password=pg['password']
             )
-            materialized_count += 1
+            try:
+                # Cursors stream server-side and must run inside a transaction
+                async with conn.transaction():
+                    cursor = await conn.cursor(query)
+                    while rows := await cursor.fetch(chunk_size):
+                        await queue.put(rows)
+            finally:
+                await conn.close()
+                await queue.put(None)  # End of stream
         
-        # Execute all Redis commands in batch
-        pipeline.execute()
+        async def write_redis() -> int:
+            client = redis.asyncio.Redis(**self.redis_params)
+            await client.hset(self.SCHEMA_KEY, mapping=self.FIELD_NAME)
+            materialized_count = 0
+            
+            try:
+                while (rows := await queue.get()) is not None:
+                    # One pipeline per chunk so neither Redis nor the client buffers the whole load
+                    pipeline = client.pipeline(transaction=False)
+                    keys = [self._key(row[0]) for row in rows]  # equipment_id is always first
+                    
+                    for key, row in zip(keys, rows):
+                        mapping = dict(zip(aliases, map(pack, row)))
+                        mapping.update(metadata_fields)
+                        
+                        # Store in Redis with key pattern: equipment:{equipment_id}
+                        # Build in a staging key and RENAME over the live one: readers never
+                        # see a half-written or missing hash, and stale fields (or an older
+                        # string value) are replaced in one step
+                        staging_key = f"staging:{key}"
+                        pipeline.delete(staging_key)
+                        pipeline.hset(staging_key, mapping=mapping)
+                        pipeline.expire(staging_key, ttl_seconds)
+                        pipeline.rename(staging_key, key)
+                    
+                    await pipeline.execute()
+                    materialized_count += len(rows)
+            finally:
+                await client.aclose()
+            
+            return materialized_count
         
-        cur.close()
-        conn.close()
+        _, materialized_count = await asyncio.gather(read_postgres(), write_redis())
+        self.invalidate_features()
         
         logger.info(f"✅ Materialized {materialized_count} equipment features to Redis")
         logger.info(f"   TTL: {ttl_seconds} seconds ({ttl_seconds/3600:.1f} hours)")
@@ -142,12 +365,18 @@ class OnlineFeatureStore:
         Returns:
             Dictionary of features or None if not found
         """
-        key = f"equipment:{equipment_id}"
+        features = self._cache.get(equipment_id)
+        if features is not None:
+            return features
+        
+        key = self._key(equipment_id)
         
         try:
-            data = self.redis_client.get(key)
+            data = self.redis_client.hgetall(key)
             if data:
-                return json.loads(data)
+                features = self._decode(data)
+                self._cache[equipment_id] = features
+                return features
             else:
                 logger.warning(f"Features not found for {equipment_id}")
                 return None
@@ -155,34 +384,117 @@ class OnlineFeatureStore:
             logger.error(f"Error retrieving features for {equipment_id}: {e}")
             return None
     
-    def get_batch_features(self, equipment_ids: List[str]) -> Dict[str, Dict]:
+    def get_batch_features(self, equipment_ids: List[str], shard_threshold: int = 512) -> Dict[str, Dict]:
         """
         Get features for multiple equipment (batch retrieval)
         
         Args:
             equipment_ids: List of equipment identifiers
+            shard_threshold: Above this many IDs, fetch with concurrent shard pipelines
+        
+        Returns:
+            Dictionary mapping equipment_id to features
+        """
+        if len(equipment_ids) > shard_threshold:
+            result = asyncio.run(self.get_batch_features_async(equipment_ids))
+        else:
+            keys = [self._key(eq_id) for eq_id in equipment_ids]
+            
+            # Use pipeline for efficient batch retrieval (read-only: no MULTI/EXEC)
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipeline.hgetall(key)
+            
+            values = pipeline.execute()
+            
+            # Build result dictionary
+            result = {}
+            for equipment_id, value in zip(equipment_ids, values):
+                if value:
+                    result[equipment_id] = self._decode(value)
+        
+        logger.info(f"Retrieved features for {len(result)}/{len(equipment_ids)} equipment")
+        return result
+    
+    async def get_batch_features_async(self, equipment_ids: List[str], shard_size: int = 256) -> Dict[str, Dict]:
+        """
+        Get features for many equipment with concurrent pipelines
+        
+        IDs are split into shards of shard_size; each shard's pipeline runs on
+        its own connection so large batches aren't serialized on one socket.
+        
+        Args:
+            equipment_ids: List of equipment identifiers
+            shard_size: IDs per pipeline
         
         Returns:
             Dictionary mapping equipment_id to features
         """
-        keys = [f"equipment:{eq_id}" for eq_id in equipment_ids]
+        shards = [equipment_ids[i:i + shard_size] for i in range(0, len(equipment_ids), shard_size)]
+        client = redis.asyncio.Redis(**self.redis_params)
         
-        # Use pipeline for efficient batch retrieval
-        pipeline = self.redis_client.pipeline()
-        for key in keys:
-            pipeline.get(key)
+        async def fetch_shard(shard: List[str]) -> List:
+            pipeline = client.pipeline(transaction=False)
+            for eq_id in shard:
+                pipeline.hgetall(self._key(eq_id))
+            return await pipeline.execute()
         
-        values = pipeline.execute()
+        try:
+            shard_values = await asyncio.gather(*(fetch_shard(shard) for shard in shards))
+        finally:
+            await client.aclose()
         
-        # Build result dictionary
         result = {}
-        for equipment_id, value in zip(equipment_ids, values):
-            if value:
-                result[equipment_id] = json.loads(value)
+        for shard, values in zip(shards, shard_values):
+            for equipment_id, value in zip(shard, values):
+                if value:
+                    result[equipment_id] = self._decode(value)
         
-        logger.info(f"Retrieved features for {len(result)}/{len(equipment_ids)} equipment")
         return result
     
+    def get_features_many(self, equipment_ids: List[str]) -> List[Optional[Dict]]:
+        """
+        Get features for multiple equipment in a single pipelined round-trip
+        
+        Args:
+            equipment_ids: List of equipment identifiers
+        
+        Returns:
+            List aligned with equipment_ids (None where features are missing)
+        """
+        results, missing = self._split_cached(equipment_ids)
+        
+        if missing:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for i in missing:
+                pipeline.hgetall(self._key(equipment_ids[i]))
+            self._fill_cached(equipment_ids, results, missing, pipeline.execute())
+        
+        return results
+    
+    def get_features_subset(self, equipment_id: str, fields: List[str]) -> Optional[Dict]:
+        """
+        Get only some features for an equipment (HMGET, bypasses the cache)
+        
+        Args:
+            equipment_id: Equipment identifier
+            fields: Feature names to fetch
+        
+        Returns:
+            Dictionary of the requested features (None values for fields not
+            stored), or None if the equipment is not found
+        """
+        values = self.redis_client.hmget(
+            self._key(equipment_id),
+            [self.FIELD_ALIAS.get(name, name) for name in fields]
+        )
+        if all(value is None for value in values):
+            return None
+        return {
+            name: None if value is None else msgpack.unpackb(value, raw=False)
+            for name, value in zip(fields, values)
+        }
+    
     def list_available_equipment(self) -> List[str]:
         """
         List all equipment that have features in Redis
@@ -190,8 +502,8 @@ class OnlineFeatureStore:
         Returns:
             List of equipment IDs
         """
-        keys = self.redis_client.keys("equipment:*")
-        equipment_ids = [key.replace("equipment:", "") for key in keys]
+        keys = self.redis_client.scan_iter(match=self.KEY_PATTERN, count=self.SCAN_COUNT)
+        equipment_ids = {self._equipment_id(key) for key in keys}  # SCAN may repeat keys
         return sorted(equipment_ids)
     
     def get_store_stats(self) -> Dict:
@@ -201,19 +513,20 @@ class OnlineFeatureStore:
         Returns:
             Dictionary with store statistics
         """
-        equipment_count = len(self.redis_client.keys("equipment:*"))
+        # SCAN instead of KEYS so large stores don't block Redis
+        sample_keys = list(set(self.redis_client.scan_iter(match=self.KEY_PATTERN, count=self.SCAN_COUNT)))
+        equipment_count = len(sample_keys)
         
         # Get Redis memory info
         info = self.redis_client.info('memory')
         memory_used_mb = info['used_memory'] / (1024 * 1024)
         
         # Sample one key to get feature count
-        sample_keys = self.redis_client.keys("equipment:*")
         feature_count = 0
         if sample_keys:
-            sample_data = self.redis_client.get(sample_keys[0])
+            sample_data = self.redis_client.hgetall(sample_keys[0])
             if sample_data:
-                feature_count = len(json.loads(sample_data))
+                feature_count = len(self._decode(sample_data))
         
         return {
             'equipment_count': equipment_count,
@@ -222,18 +535,169 @@ class OnlineFeatureStore:
             'redis_db': 0
         }
     
+    def get_store_stats_cached(self, ttl_seconds: float = 5.0) -> Dict:
+        """
+        Get store statistics, recomputing at most once per ttl_seconds
+        
+        Use on hot paths (e.g. health checks) instead of get_store_stats
+        """
+        computed_at, stats = self._stats_cache
+        now = time.monotonic()
+        
+        if stats is None or now - computed_at > ttl_seconds:
+            stats = self.get_store_stats()
+            self._stats_cache = (now, stats)
+        
+        return stats
+    
     def clear_all_features(self):
         """
         Clear all features from Redis (use with caution!)
         """
-        keys = self.redis_client.keys("equipment:*")
-        if keys:
-            self.redis_client.delete(*keys)
-            logger.info(f"Cleared {len(keys)} feature keys from Redis")
+        self.invalidate_features()
+        
+        # SCAN + UNLINK in batches: non-blocking listing and background freeing
+        cleared = 0
+        batch = []
+        for key in self.redis_client.scan_iter(match=self.KEY_PATTERN, count=self.SCAN_COUNT):
+            batch.append(key)
+            if len(batch) == self.UNLINK_BATCH:
+                cleared += self.redis_client.unlink(*batch)
+                batch = []
+        if batch:
+            cleared += self.redis_client.unlink(*batch)
+        
+        if cleared:
+            logger.info(f"Cleared {cleared} feature keys from Redis")
         else:
             logger.info("No features to clear")
 
 
+class AsyncOnlineFeatureStore(OnlineFeatureStore):
+    """
+    Online feature store with non-blocking reads for async servers
+    
+    Read methods are coroutines backed by redis.asyncio, so an event loop
+    can overlap Redis I/O across concurrent requests. Materialization and
+    maintenance methods are inherited and stay synchronous.
+    """
+    
+    def __init__(self, redis_host: str = 'localhost', redis_port: int = 6379):
+        """Initialize sync (materialization) and async (serving) Redis clients"""
+        super().__init__(redis_host=redis_host, redis_port=redis_port)
+        
+        # Blocking pool: bursts beyond max_connections wait for a free
+        # connection instead of failing
+        self.async_redis_client = redis.asyncio.Redis(
+            connection_pool=redis.asyncio.BlockingConnectionPool(
+                max_connections=self.max_connections,
+                timeout=5,
+                **self.redis_params
+            )
+        )
+    
+    async def close(self):
+        """Close the async Redis connection pool"""
+        await self.async_redis_client.aclose()
+    
+    async def get_features(self, equipment_id: str) -> Optional[Dict]:
+        """
+        Get features for a single equipment from Redis
+        
+        Args:
+            equipment_id: Equipment identifier (e.g., 'PUMP-001')
+        
+        Returns:
+            Dictionary of features or None if not found
+        """
+        features = self._cache.get(equipment_id)
+        if features is not None:
+            return features
+        
+        try:
+            data = await self.async_redis_client.hgetall(self._key(equipment_id))
+            if data:
+                features = self._decode(data)
+                self._cache[equipment_id] = features
+                return features
+            else:
+                logger.warning(f"Features not found for {equipment_id}")
+                return None
+        except Exception as e:
+            logger.error(f"Error retrieving features for {equipment_id}: {e}")
+            return None
+    
+    async def get_features_many(self, equipment_ids: List[str]) -> List[Optional[Dict]]:
+        """
+        Get features for multiple equipment in a single pipelined round-trip
+        
+        Args:
+            equipment_ids: List of equipment identifiers
+        
+        Returns:
+            List aligned with equipment_ids (None where features are missing)
+        """
+        results, missing = self._split_cached(equipment_ids)
+        
+        if missing:
+            pipeline = self.async_redis_client.pipeline(transaction=False)
+            for i in missing:
+                pipeline.hgetall(self._key(equipment_ids[i]))
+            self._fill_cached(equipment_ids, results, missing, await pipeline.execute())
+        
+        return results
+    
+    async def list_available_equipment(self) -> List[str]:
+        """
+        List all equipment that have features in Redis
+        
+        Returns:
+            List of equipment IDs
+        """
+        keys = self.async_redis_client.scan_iter(match=self.KEY_PATTERN, count=self.SCAN_COUNT)
+        return sorted({self._equipment_id(key) async for key in keys})
+    
+    async def get_store_stats(self) -> Dict:
+        """
+        Get statistics about the online feature store
+        
+        Returns:
+            Dictionary with store statistics
+        """
+        keys = list({key async for key in self.async_redis_client.scan_iter(match=self.KEY_PATTERN, count=self.SCAN_COUNT)})
+        
+        info = await self.async_redis_client.info('memory')
+        memory_used_mb = info['used_memory'] / (1024 * 1024)
+        
+        feature_count = 0
+        if keys:
+            sample_data = await self.async_redis_client.hgetall(keys[0])
+            if sample_data:
+                feature_count = len(self._decode(sample_data))
+        
+        return {
+            'equipment_count': len(keys),
+            'features_per_equipment': feature_count,
+            'memory_used_mb': round(memory_used_mb, 2),
+            'redis_db': 0
+        }
+    
+    async def get_store_stats_cached(self, ttl_seconds: float = 5.0) -> Dict:
+        """
+        Get store statistics, recomputing at most once per ttl_seconds
+        
+        Use on hot paths (e.g. health checks) instead of get_store_stats
+        """
+        computed_at, stats = self._stats_cache
+        now = time.monotonic()
+        
+        if stats is None or now - computed_at > ttl_seconds:
+            stats = await self.get_store_stats()
+            self._stats_cache = (now, stats)
+        
+        return stats
+
+
 if __name__ == '__main__':
     # Demo usage
     print("="*70)
@@ -4,6 +4,8 @@ Trains XGBoost model to predict equipment failures
 """
 
 import sys
+import os
+import tempfile
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
@@ -13,6 +15,7 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import OneHotEncoder
 from sklearn.metrics import (
     accuracy_score, precision_score, recall_score, 
     f1_score, roc_auc_score, confusion_matrix,
@@ -35,6 +38,9 @@ class EquipmentFailurePredictor:
     def __init__(self):
         self.offline_store = OfflineFeatureStore()
         
+        # Fitted categorical encoder (set by create_training_dataset, logged with the model)
+        self.encoder = None
+        
         # PostgreSQL connection for labels
         self.pg_conn_params = {
             'host': 'localhost',
@@ -56,7 +62,7 @@ class EquipmentFailurePredictor:
         Features: Equipment characteristics and history
         
         Args:
-            prediction_window_days: How far ahead to predict (default 365 days - looks back at historical failures)
+            prediction_window_days: Kept for API compatibility; labels currently use the full failure history
         
         Returns:
             X (features), y (labels), feature_names
@@ -79,48 +85,32 @@ class EquipmentFailurePredictor:
         db_url = f"postgresql://{self.pg_conn_params['user']}:{self.pg_conn_params['password']}@{self.pg_conn_params['host']}:{self.pg_conn_params['port']}/{self.pg_conn_params['dbname']}"
         engine = create_engine(db_url)
         
+        # Labels only need which equipment has failed, so let PostgreSQL dedupe
         failures_query = """
-        SELECT 
-            equipment_id,
-            failure_date,
-            failure_type,
-            severity,
-            downtime_hours
+        SELECT DISTINCT equipment_id
         FROM failure_history
-        ORDER BY failure_date
         """
         
         failures_df = pd.read_sql(failures_query, engine)
         engine.dispose()
         
-        logger.info(f"   Loaded {len(failures_df)} failure records")
+        logger.info(f"   Loaded failure history for {len(failures_df)} equipment")
         
         # Create labels: Has this equipment failed in the past year? (retrospective)
         # Note: In production, you'd use point-in-time features and forward-looking labels
         # For demo purposes with limited data, we look at historical failures
-        logger.info(f"\n3. Creating labels (looking at failures in past {prediction_window_days} days)...")
-        
-        labels = []
-        feature_date = features_df['feature_date'].iloc[0]
-        
-        for _, equipment in features_df.iterrows():
-            equipment_id = equipment['equipment_id']
-            
-            # Find ANY historical failures for this equipment
-            equipment_failures = failures_df[failures_df['equipment_id'] == equipment_id]
-            
-            # Label: 1 if has failed before, 0 if never failed
-            # This creates a "failure-prone equipment" predictor
-            label = 1 if len(equipment_failures) > 0 else 0
-            labels.append(label)
+        logger.info("\n3. Creating labels (equipment with any recorded failure)...")
         
-        features_df['label'] = labels
+        # Label: 1 if has failed before, 0 if never failed
+        # This creates a "failure-prone equipment" predictor
+        failed_ids = failures_df['equipment_id'].unique()
+        features_df['label'] = features_df['equipment_id'].isin(failed_ids).astype(np.int8)
         
         # Class distribution
-        positive_class = sum(labels)
-        negative_class = len(labels) - positive_class
-        logger.info(f"   Positive class (failures): {positive_class} ({positive_class/len(labels)*100:.1f}%)")
-        logger.info(f"   Negative class (no failure): {negative_class} ({negative_class/len(labels)*100:.1f}%)")
+        positive_class = int(features_df['label'].sum())
+        negative_class = len(features_df) - positive_class
+        logger.info(f"   Positive class (failures): {positive_class} ({positive_class/len(features_df)*100:.1f}%)")
+        logger.info(f"   Negative class (no failure): {negative_class} ({negative_class/len(features_df)*100:.1f}%)")
         
         # Select feature columns for training
         feature_columns = [
@@ -139,16 +129,18 @@ class EquipmentFailurePredictor:
         logger.info("\n4. Encoding categorical features...")
         categorical_features = ['equipment_type', 'age_category', 'risk_tier']
         
-        for cat_feature in categorical_features:
-            dummies = pd.get_dummies(features_df[cat_feature], prefix=cat_feature)
-            features_df = pd.concat([features_df, dummies], axis=1)
-            feature_columns.extend(dummies.columns.tolist())
+        # Fitted encoder is persisted with the model so serving can reuse the
+        # exact categories and column order instead of re-deriving them
+        self.encoder = OneHotEncoder(sparse_output=False, dtype=np.uint8, handle_unknown='ignore')
+        one_hot = self.encoder.fit_transform(features_df[categorical_features])
+        numeric = features_df[feature_columns].fillna(0).to_numpy(dtype=np.float32)  # Handle any NaN values
+        feature_columns.extend(self.encoder.get_feature_names_out(categorical_features).tolist())
         
         logger.info(f"   Total features: {len(feature_columns)}")
         
-        # Prepare X (features) and y (labels)
-        X = features_df[feature_columns].fillna(0)  # Handle any NaN values
-        y = features_df['label']
+        # Prepare X (features) and y (labels) as one dense float32 matrix
+        X = np.hstack([numeric, one_hot], dtype=np.float32)
+        y = features_df['label'].to_numpy()  # int8 ndarray (no index alignment in the split)
         
         logger.info("\n5. Dataset summary:")
         logger.info(f"   Samples: {len(X)}")
@@ -188,38 +180,60 @@ class EquipmentFailurePredictor:
             # Calculate scale_pos_weight for class imbalance
             scale_pos_weight = (y_train == 0).sum() / max((y_train == 1).sum(), 1)
             
-            # XGBoost parameters
+            # XGBoost parameters (native API: boosting rounds are passed to xgb.train)
+            num_boost_round = 50
             params = {
                 'objective': 'binary:logistic',
+                'tree_method': 'hist',
+                'device': 'cpu',
+                'max_bin': 256,
+                'nthread': os.cpu_count() or 1,  # native-API name for n_jobs (all cores)
                 'max_depth': 3,
                 'learning_rate': 0.1,
-                'n_estimators': 50,
                 'subsample': 0.8,
                 'colsample_bytree': 0.8,
-                'random_state': random_state,
+                'seed': random_state,
                 'eval_metric': 'logloss',
                 'scale_pos_weight': scale_pos_weight
             }
             
             # Log parameters
             mlflow.log_params(params)
+            mlflow.log_param("n_estimators", num_boost_round)
             mlflow.log_param("test_size", test_size)
             mlflow.log_param("n_features", len(feature_names))
             
+            # Convert once to contiguous float32 and reuse the DMatrix for
+            # training, evaluation and metrics (no per-call DataFrame copies).
+            # 'hist' only needs the quantized bins, so QuantileDMatrix skips
+            # keeping a full float copy; the test set reuses the training cuts
+            X_train_np = np.ascontiguousarray(X_train, dtype=np.float32)
+            X_test_np = np.ascontiguousarray(X_test, dtype=np.float32)
+            dtrain = xgb.QuantileDMatrix(X_train_np, label=y_train, feature_names=feature_names,
+                                         max_bin=params['max_bin'])
+            dtest = xgb.QuantileDMatrix(X_test_np, label=y_test, feature_names=feature_names,
+                                        ref=dtrain)
+            
             # Train model
-            model = xgb.XGBClassifier(**params)
-            model.fit(
-                X_train, y_train,
-                eval_set=[(X_test, y_test)],
-                verbose=False
+            booster = xgb.train(
+                params,
+                dtrain,
+                num_boost_round=num_boost_round,
+                evals=[(dtest, 'test')],
+                verbose_eval=False
             )
             
+            # Wrap in XGBClassifier so the logged model keeps the sklearn
+            # interface the inference API expects (get_booster, predict_proba)
+            model = xgb.XGBClassifier()
+            model.load_model(bytearray(booster.save_raw('json')))
+            
             logger.info("   ✅ Model training complete")
             
             # Make predictions
             logger.info("\n8. Evaluating model...")
-            y_pred = model.predict(X_test)
-            y_pred_proba = model.predict_proba(X_test)[:, 1]
+            y_pred_proba = booster.predict(dtest)
+            y_pred = (y_pred_proba >= 0.5).astype(np.int8)
             
             # Calculate metrics
             metrics = {
@@ -266,31 +280,33 @@ class EquipmentFailurePredictor:
             for idx, row in feature_importance.head(10).iterrows():
                 logger.info(f"   {row['feature']:<30} {row['importance']:.4f}")
             
-            # Log feature importance as artifact
-            importance_dict = dict(zip(feature_importance['feature'], feature_importance['importance'].astype(float)))
-            mlflow.log_dict(importance_dict, "feature_importance.json")
+            # Log feature importance as a columnar artifact (binary float32, not JSON text)
+            with tempfile.TemporaryDirectory() as tmpdir:
+                importance_path = os.path.join(tmpdir, "feature_importance.parquet")
+                feature_importance.astype({'importance': np.float32}).to_parquet(
+                    importance_path, index=False, compression='snappy'
+                )
+                mlflow.log_artifact(importance_path)
             
             # Log model
             logger.info("\n10. Logging model to MLflow...")
             
-            # Save model as pickle (compatible with all MLflow versions)
+            # Native XGBoost format via the MLflow flavor (compact, no pickle of
+            # the sklearn wrapper); also registers the model
+            mlflow.xgboost.log_model(
+                model,
+                artifact_path="model",
+                registered_model_name="equipment_failure_predictor"
+            )
+            
+            # Save the fitted one-hot encoder (categories + column order)
             import pickle
-            import tempfile
-            import os
             
             with tempfile.TemporaryDirectory() as tmpdir:
-                # Save as pickle
-                model_path = os.path.join(tmpdir, "model.pkl")
-                with open(model_path, 'wb') as f:
-                    pickle.dump(model, f)
-                
-                # Save as XGBoost native format
-                xgb_model_path = os.path.join(tmpdir, "model.json")
-                model.save_model(xgb_model_path)
-                
-                # Log both files
-                mlflow.log_artifact(model_path, "model")
-                mlflow.log_artifact(xgb_model_path, "model")
+                encoder_path = os.path.join(tmpdir, "encoder.pkl")
+                with open(encoder_path, 'wb') as f:
+                    pickle.dump(self.encoder, f)
+                mlflow.log_artifact(encoder_path, "model")
             
             logger.info(f"    ✅ Model logged to MLflow")
             logger.info(f"    MLflow UI: http://localhost:5000")
@@ -4,9 +4,13 @@ Loads equipment, sensor, maintenance, and failure data for ML features
 Works with your existing PostgreSQL and TimescaleDB setup
 """
 
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
 import psycopg2
+from psycopg2.extras import execute_values
 from datetime import datetime, timedelta
-import random
+import numpy as np
 
 # Use your existing database credentials
 POSTGRES_CONN = {
@@ -25,6 +29,18 @@ TIMESCALE_CONN = {
     'password': 'timeseries_pass'
 }
 
+# Hypertable chunk size. TimescaleDB guidance: size chunks so the active one
+# (with its indexes) fits in ~25% of RAM. The 7-day sample set is tiny, so it
+# all lives in a single chunk; override for larger ingest volumes
+CHUNK_INTERVAL = os.environ.get('CHUNK_INTERVAL', '7 days')
+
+# Seed for the generated sample data (NumPy PCG64 and PostgreSQL random())
+# so repeated loads produce the same distributions
+RANDOM_SEED = 42
+
+# Technician names for generated maintenance records (built once, indexed per row)
+TECH_NAMES = tuple(f"Technician {i}" for i in range(1, 11))
+
 # Sample data - Equipment inventory
 EQUIPMENT_DATA = [
     ('PUMP-001', 'Centrifugal Pump', 'Building A', '2023-01-15', 'Acme Pumps', 'CP-500', 500, '2025-12-01'),
@@ -54,102 +70,108 @@ SENSOR_DATA = [
 ]
 
 
-def load_equipment_data():
-    """Load equipment and sensor data into PostgreSQL"""
+def load_equipment_data(conn):
+    """Load equipment and sensor data into PostgreSQL (over an open connection)"""
     print("\n" + "="*70)
     print("LOADING EQUIPMENT DATA INTO POSTGRESQL")
     print("="*70)
     
-    conn = psycopg2.connect(**POSTGRES_CONN)
+    conn.autocommit = False
     cur = conn.cursor()
     
     try:
+        # Everything below is one transaction (single commit at the end).
+        # Sample data can be regenerated, so the commit needn't wait for fsync
+        cur.execute("SET LOCAL synchronous_commit TO off;")
+        
         # Load equipment data
         print("\n1. Loading equipment records...")
-        for equip in EQUIPMENT_DATA:
-            cur.execute("""
-                INSERT INTO equipment (
-                    equipment_id, equipment_type, location, installation_date,
-                    manufacturer, model, rated_capacity, last_maintenance_date
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (equipment_id) DO NOTHING
-            """, equip)
+        execute_values(cur, """
+            INSERT INTO equipment (
+                equipment_id, equipment_type, location, installation_date,
+                manufacturer, model, rated_capacity, last_maintenance_date
+            ) VALUES %s
+            ON CONFLICT (equipment_id) DO NOTHING
+        """, EQUIPMENT_DATA, page_size=1000)
         
         print(f"   ✅ Loaded {len(EQUIPMENT_DATA)} equipment records")
         
         # Load sensor data
         print("\n2. Loading sensor mappings...")
-        for sensor in SENSOR_DATA:
-            cur.execute("""
-                INSERT INTO sensors (
-                    sensor_id, equipment_id, sensor_type, measurement_unit,
-                    normal_range_min, normal_range_max, critical_threshold
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (sensor_id) DO NOTHING
-            """, sensor)
+        execute_values(cur, """
+            INSERT INTO sensors (
+                sensor_id, equipment_id, sensor_type, measurement_unit,
+                normal_range_min, normal_range_max, critical_threshold
+            ) VALUES %s
+            ON CONFLICT (sensor_id) DO NOTHING
+        """, SENSOR_DATA, page_size=1000)
         
         print(f"   ✅ Loaded {len(SENSOR_DATA)} sensor records")
         
         # Generate sample maintenance history
         print("\n3. Generating maintenance history...")
         maintenance_types = ['Routine', 'Preventive', 'Corrective', 'Emergency']
-        maintenance_count = 0
-        
-        for equipment_id, *_ in EQUIPMENT_DATA:
-            # Generate 3-10 random maintenance records per equipment
-            num_records = random.randint(3, 10)
-            for _ in range(num_records):
-                days_ago = random.randint(30, 365)
-                maintenance_date = datetime.now() - timedelta(days=days_ago)
-                
-                cur.execute("""
-                    INSERT INTO maintenance_history (
-                        equipment_id, maintenance_date, maintenance_type,
-                        description, cost, performed_by
-                    ) VALUES (%s, %s, %s, %s, %s, %s)
-                """, (
-                    equipment_id,
-                    maintenance_date.date(),
-                    random.choice(maintenance_types),
-                    f"Maintenance performed on {equipment_id}",
-                    round(random.uniform(100, 5000), 2),
-                    f"Technician {random.randint(1, 10)}"
-                ))
-                maintenance_count += 1
-        
-        print(f"   ✅ Generated {maintenance_count} maintenance records")
+        equipment_ids = [equipment_id for equipment_id, *_ in EQUIPMENT_DATA]
+        
+        # setseed() takes a value in [-1, 1]
+        cur.execute("SELECT setseed(%s)", (RANDOM_SEED / 100,))
+        
+        # Generated server-side in one statement: 3-10 records per equipment
+        # (the per-equipment count is drawn in the subquery so LATERAL
+        # re-evaluates generate_series for every row), no rows on the wire
+        cur.execute("""
+            INSERT INTO maintenance_history (
+                equipment_id, maintenance_date, maintenance_type,
+                description, cost, performed_by
+            )
+            SELECT
+                e.equipment_id,
+                (now() - (30 + floor(random() * 336)) * INTERVAL '1 day')::date,
+                (%(types)s::text[])[1 + floor(random() * cardinality(%(types)s::text[]))::int],
+                e.description,
+                round((100 + random() * 4900)::numeric, 2),
+                (%(technicians)s::text[])[1 + floor(random() * cardinality(%(technicians)s::text[]))::int]
+            FROM (
+                SELECT equipment_id,
+                       'Maintenance performed on ' || equipment_id AS description,
+                       3 + floor(random() * 8)::int AS num_records
+                FROM equipment
+                WHERE equipment_id = ANY(%(equipment_ids)s)
+            ) e
+            CROSS JOIN LATERAL generate_series(1, e.num_records)
+        """, {'types': maintenance_types, 'technicians': list(TECH_NAMES), 'equipment_ids': equipment_ids})
+        
+        print(f"   ✅ Generated {cur.rowcount} maintenance records")
         
         # Generate sample failure history (labels for ML training)
         print("\n4. Generating failure history (ML training labels)...")
         failure_types = ['Overheating', 'Mechanical Wear', 'Electrical', 'Seal Failure']
         severities = ['Low', 'Medium', 'High', 'Critical']
-        failure_count = 0
-        
-        for equipment_id, *_ in EQUIPMENT_DATA:
-            # 30% chance of having failures
-            if random.random() < 0.3:
-                num_failures = random.randint(1, 3)
-                for _ in range(num_failures):
-                    days_ago = random.randint(10, 180)
-                    failure_date = datetime.now() - timedelta(days=days_ago)
-                    
-                    cur.execute("""
-                        INSERT INTO failure_history (
-                            equipment_id, failure_date, failure_type, severity,
-                            downtime_hours, repair_cost, root_cause
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        equipment_id,
-                        failure_date,
-                        random.choice(failure_types),
-                        random.choice(severities),
-                        round(random.uniform(1, 48), 2),
-                        round(random.uniform(500, 15000), 2),
-                        "Investigation pending"
-                    ))
-                    failure_count += 1
-        
-        print(f"   ✅ Generated {failure_count} failure records")
+        
+        # 30% of equipment get 1-3 failures each, 10-180 days ago
+        cur.execute("""
+            INSERT INTO failure_history (
+                equipment_id, failure_date, failure_type, severity,
+                downtime_hours, repair_cost, root_cause
+            )
+            SELECT
+                e.equipment_id,
+                now() - (10 + floor(random() * 171)) * INTERVAL '1 day',
+                (%(types)s::text[])[1 + floor(random() * cardinality(%(types)s::text[]))::int],
+                (%(severities)s::text[])[1 + floor(random() * cardinality(%(severities)s::text[]))::int],
+                round((1 + random() * 47)::numeric, 2),
+                round((500 + random() * 14500)::numeric, 2),
+                'Investigation pending'
+            FROM (
+                SELECT equipment_id, 1 + floor(random() * 3)::int AS num_failures
+                FROM equipment
+                WHERE equipment_id = ANY(%(equipment_ids)s)
+                  AND random() < 0.3
+            ) e
+            CROSS JOIN LATERAL generate_series(1, e.num_failures)
+        """, {'types': failure_types, 'severities': severities, 'equipment_ids': equipment_ids})
+        
+        print(f"   ✅ Generated {cur.rowcount} failure records")
         print(f"   💡 These failures are your ML training labels!")
         
         conn.commit()
@@ -161,26 +183,31 @@ def load_equipment_data():
         raise
     finally:
         cur.close()
-        conn.close()
 
 
-def load_sensor_events():
-    """Load historical sensor events into TimescaleDB"""
+def load_sensor_events(conn):
+    """Load historical sensor events into TimescaleDB (over an open connection)"""
     print("\n" + "="*70)
     print("LOADING SENSOR EVENTS INTO TIMESCALEDB")
     print("="*70)
     
-    conn = psycopg2.connect(**TIMESCALE_CONN)
+    conn.autocommit = False
     cur = conn.cursor()
     
     try:
         # Create sensor_events table if it doesn't exist
         print("\n1. Creating sensor_events table...")
         
+        # DDL and bulk load run as one transaction: a failed load leaves no
+        # half-filled table, and the rebuildable sample data doesn't need to
+        # wait for a synchronous WAL flush at commit
+        cur.execute("SET LOCAL synchronous_commit TO off;")
+        
         # First, drop the table if it exists (to start fresh)
         cur.execute("DROP TABLE IF EXISTS sensor_events CASCADE;")
         
         # Create table WITHOUT primary key (TimescaleDB handles uniqueness differently)
+        # Stays LOGGED: TimescaleDB cannot turn an UNLOGGED table into a hypertable
         cur.execute("""
             CREATE TABLE sensor_events (
                 event_id VARCHAR(100) NOT NULL,
@@ -195,12 +222,87 @@ def load_sensor_events():
         # Convert to hypertable BEFORE adding indexes
         cur.execute("""
             SELECT create_hypertable('sensor_events', 'timestamp',
-                chunk_time_interval => INTERVAL '1 day'
+                chunk_time_interval => %s::interval
             );
-        """)
+        """, (CHUNK_INTERVAL,))
         print("   ✅ Created TimescaleDB hypertable")
         
-        # Now add indexes (after hypertable conversion)
+        # Generate historical sensor events (last 7 days)
+        print("\n2. Generating sensor events (this may take 15-30 seconds)...")
+        
+        start_date = datetime.now() - timedelta(days=7)
+        
+        # Stream every event through a single COPY instead of batched INSERTs
+        buffer = io.StringIO()
+        
+        rng = np.random.default_rng(RANDOM_SEED)
+        events_per_sensor = 200
+        start = np.datetime64(start_date, 'us')
+        
+        # Generate 200 events per sensor (spread over 7 days) for all sensors at once
+        sensor_ids = [sensor_id for sensor_id, *_ in SENSOR_DATA]
+        base_temps = np.array([(min_temp + max_temp) / 2 for _, _, _, _, min_temp, max_temp, _ in SENSOR_DATA])
+        sensor_idx = np.repeat(np.arange(len(SENSOR_DATA)), events_per_sensor)
+        event_idx = np.tile(np.arange(events_per_sensor), len(SENSOR_DATA))
+        total_events = len(sensor_idx)
+        
+        # Random time within the 7-day window
+        offsets = rng.integers(0, 7 * 24 * 60, size=total_events, endpoint=True)
+        timestamps = start + offsets.astype('timedelta64[m]')
+        days = timestamps.astype('datetime64[D]')
+        seconds_of_day = (timestamps.astype('datetime64[s]') - days).astype(np.int64)
+        hours = seconds_of_day // 3600
+        
+        # Daily cycle (higher during day, lower at night) plus random noise
+        hour_factor = 1.0 + 0.2 * np.abs(12 - hours) / 12
+        noise = rng.normal(0, 3, size=total_events)
+        
+        # Occasional anomalies (5% chance - these help test anomaly detection)
+        anomaly_mask = rng.random(total_events) < 0.05
+        anomaly_add = rng.uniform(10, 20, size=total_events) * anomaly_mask
+        
+        temperatures = base_temps[sensor_idx] * hour_factor + noise + anomaly_add
+        
+        # Write in time order so the COPY fills one hypertable chunk after
+        # another instead of touching every chunk in the window
+        order = np.argsort(timestamps, kind='stable')
+        
+        # The event_id suffix is YYYYMMDDHHMMSS, built as one int64 per event
+        # from calendar fields instead of a strftime per row
+        months = days.astype('datetime64[M]')
+        compact_ts = (
+            (months.astype('datetime64[Y]').astype(np.int64) + 1970) * 10**10
+            + (months.astype(np.int64) % 12 + 1) * 10**8
+            + ((days - months).astype(np.int64) + 1) * 10**6
+            + hours * 10**4
+            + seconds_of_day % 3600 // 60 * 100
+            + seconds_of_day % 60
+        )
+        
+        # Format each line straight into the COPY buffer from time-ordered
+        # plain-Python columns (no per-row tuples or NumPy scalar indexing)
+        iso_timestamps = np.datetime_as_string(timestamps[order], unit='us').tolist()
+        ordered_sensor_ids = [sensor_ids[i] for i in sensor_idx[order].tolist()]
+        buffer.writelines(
+            f"{sensor_id}_{ts}_{i}\t{sensor_id}\t{iso_ts}\t{temperature:.2f}\n"
+            for sensor_id, ts, i, iso_ts, temperature in zip(
+                ordered_sensor_ids,
+                compact_ts[order].tolist(),
+                event_idx[order].tolist(),
+                iso_timestamps,
+                temperatures[order].tolist()
+            )
+        )
+        
+        buffer.seek(0)
+        cur.copy_expert("""
+            COPY sensor_events (event_id, sensor_id, timestamp, temperature)
+            FROM STDIN WITH (FORMAT text)
+        """, buffer)
+        
+        # Build secondary indexes after the load: one sort pass over the
+        # heap instead of per-row btree maintenance during the COPY
+        cur.execute("SET LOCAL maintenance_work_mem TO '512MB';")
         cur.execute("""
             CREATE INDEX idx_sensor_events_sensor_time 
                 ON sensor_events (sensor_id, timestamp DESC);
@@ -212,58 +314,6 @@ def load_sensor_events():
         """)
         print("   ✅ Created indexes")
         
-        conn.commit()
-        
-        # Generate historical sensor events (last 7 days)
-        print("\n2. Generating sensor events (this may take 15-30 seconds)...")
-        
-        start_date = datetime.now() - timedelta(days=7)
-        
-        batch = []
-        total_events = 0
-        
-        for sensor_id, _, sensor_type, _, min_temp, max_temp, _ in SENSOR_DATA:
-            base_temp = (min_temp + max_temp) / 2
-            
-            # Generate 200 events per sensor (spread over 7 days)
-            for i in range(200):
-                # Random time within the 7-day window
-                minutes_offset = random.randint(0, 7 * 24 * 60)
-                timestamp = start_date + timedelta(minutes=minutes_offset)
-                
-                # Add daily cycle (higher during day, lower at night)
-                hour_factor = 1.0 + 0.2 * abs(12 - timestamp.hour) / 12
-                
-                # Add random noise
-                temperature = base_temp * hour_factor + random.gauss(0, 3)
-                
-                # Occasional anomalies (5% chance - these help test anomaly detection)
-                if random.random() < 0.05:
-                    temperature += random.uniform(10, 20)
-                
-                event_id = f"{sensor_id}_{timestamp.strftime('%Y%m%d%H%M%S')}_{i}"
-                batch.append((event_id, sensor_id, timestamp, round(temperature, 2)))
-                
-                # Insert in batches of 500 for performance
-                if len(batch) >= 500:
-                    cur.executemany("""
-                        INSERT INTO sensor_events (
-                            event_id, sensor_id, timestamp, temperature
-                        ) VALUES (%s, %s, %s, %s)
-                    """, batch)
-                    total_events += len(batch)
-                    batch = []
-                    print(f"   Loaded {total_events} events...", end='\r')
-        
-        # Insert remaining events
-        if batch:
-            cur.executemany("""
-                INSERT INTO sensor_events (
-                    event_id, sensor_id, timestamp, temperature
-                ) VALUES (%s, %s, %s, %s)
-            """, batch)
-            total_events += len(batch)
-        
         conn.commit()
         print(f"\n   ✅ Loaded {total_events} sensor events")
         
@@ -280,34 +330,30 @@ def load_sensor_events():
         raise
     finally:
         cur.close()
-        conn.close()
 
 
-def verify_data():
-    """Verify data was loaded correctly"""
+def verify_data(pg_conn, ts_conn):
+    """Verify data was loaded correctly (reuses the load connections)"""
     print("\n" + "="*70)
     print("VERIFYING DATA")
     print("="*70)
     
     # Check PostgreSQL
     print("\nPostgreSQL (pipeline_db):")
-    conn = psycopg2.connect(**POSTGRES_CONN)
-    cur = conn.cursor()
+    cur = pg_conn.cursor()
     
-    cur.execute("SELECT COUNT(*) FROM equipment")
-    equipment_count = cur.fetchone()[0]
+    # All four counts in one round-trip
+    cur.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM equipment),
+            (SELECT COUNT(*) FROM sensors),
+            (SELECT COUNT(*) FROM maintenance_history),
+            (SELECT COUNT(*) FROM failure_history)
+    """)
+    equipment_count, sensor_count, maintenance_count, failure_count = cur.fetchone()
     print(f"  ✅ Equipment records: {equipment_count}")
-    
-    cur.execute("SELECT COUNT(*) FROM sensors")
-    sensor_count = cur.fetchone()[0]
     print(f"  ✅ Sensor records: {sensor_count}")
-    
-    cur.execute("SELECT COUNT(*) FROM maintenance_history")
-    maintenance_count = cur.fetchone()[0]
     print(f"  ✅ Maintenance records: {maintenance_count}")
-    
-    cur.execute("SELECT COUNT(*) FROM failure_history")
-    failure_count = cur.fetchone()[0]
     print(f"  ✅ Failure records: {failure_count} (ML labels)")
     
     # Show some sample data
@@ -317,34 +363,34 @@ def verify_data():
         print(f"    - {row[0]}: {row[1]} in {row[2]}")
     
     cur.close()
-    conn.close()
     
     # Check TimescaleDB
     print("\nTimescaleDB (timeseries_db):")
-    conn = psycopg2.connect(**TIMESCALE_CONN)
-    cur = conn.cursor()
-    
-    cur.execute("SELECT COUNT(*) FROM sensor_events")
-    events_count = cur.fetchone()[0]
-    print(f"  ✅ Sensor events: {events_count}")
+    cur = ts_conn.cursor()
     
-    # Show recent sensor activity
-    print("\n  Recent sensor readings:")
+    # Per-sensor summary with the table total as a window over all groups
+    # (evaluated before LIMIT), so one query covers both
     cur.execute("""
         SELECT sensor_id, 
                COUNT(*) as reading_count,
                ROUND(AVG(temperature), 2) as avg_temp,
-               MAX(timestamp) as last_reading
+               MAX(timestamp) as last_reading,
+               SUM(COUNT(*)) OVER () as total_events
         FROM sensor_events
         GROUP BY sensor_id
         ORDER BY sensor_id
         LIMIT 5
     """)
-    for row in cur.fetchall():
+    rows = cur.fetchall()
+    events_count = rows[0][4] if rows else 0
+    print(f"  ✅ Sensor events: {events_count}")
+    
+    # Show recent sensor activity
+    print("\n  Recent sensor readings:")
+    for row in rows:
         print(f"    - {row[0]}: {row[1]} readings, avg temp {row[2]}°C, last: {row[3]}")
     
     cur.close()
-    conn.close()
     
     print("\n" + "="*70)
     print("✅ LAYER 2: DATA LAYER COMPLETE!")
@@ -368,10 +414,21 @@ if __name__ == '__main__':
     print("\n⏱️  Estimated time: 30-60 seconds")
     print("="*70)
     
+    # One connection per database for the whole run (loads and verification)
+    pg_conn = ts_conn = None
+    
     try:
-        load_equipment_data()
-        load_sensor_events()
-        verify_data()
+        pg_conn = psycopg2.connect(**POSTGRES_CONN)
+        ts_conn = psycopg2.connect(**TIMESCALE_CONN)
+        
+        # PostgreSQL and TimescaleDB are independent servers - load both at once
+        # (psycopg2 releases the GIL while waiting on libpq)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            loads = [executor.submit(load_equipment_data, pg_conn), executor.submit(load_sensor_events, ts_conn)]
+            for load in loads:
+                load.result()
+        
+        verify_data(pg_conn, ts_conn)
         
     except Exception as e:
         print(f"\n❌ Failed to load data: {e}")
@@ -379,4 +436,8 @@ if __name__ == '__main__':
         print("  1. Check Docker containers are running: docker ps")
         print("  2. Check PostgreSQL is accessible: docker exec my_postgres psql -U pipeline_user -d pipeline_db -c 'SELECT 1'")
         print("  3. Check TimescaleDB is accessible: docker exec my_timescaledb psql -U timeseries_user -d timeseries_db -c 'SELECT 1'")
-        exit(1)
\ No newline at end of file
+        exit(1)
+    finally:
+        for conn in (pg_conn, ts_conn):
+            if conn is not None:
+                conn.close()
\ No newline at end of file
@@ -8,10 +8,14 @@ Demonstrates end-to-end data engineering: ingestion → transformation → visua
 import streamlit as st
 import duckdb
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import pyarrow as pa
+import pyarrow.compute as pc
 from datetime import datetime
 
+# Plotly is imported inside each show_* page (cached in sys.modules after
+# the first use), so the first page load doesn't pay for modules it never
+# draws with
+
 # PAGE CONFIGURATION
 st.set_page_config(
     page_title="Data Warehouse Analytics",
@@ -20,10 +24,83 @@ st.set_page_config(
 )
 
 # DATABASE CONNECTION
+# Marts every page reads; loaded into DuckDB's buffer pool once per process
+PREWARM_TABLES = ('main_marts.fct_sensor_readings', 'main_marts.dim_products')
+
 @st.cache_resource
 def get_database_connection():
-    """Connect to DuckDB warehouse"""
-    return duckdb.connect('warehouse.duckdb', read_only=True)
+    """Connect to DuckDB warehouse and prewarm the hot marts"""
+    con = duckdb.connect('warehouse.duckdb', read_only=True)
+    try:
+        con.execute("INSTALL cache_prewarm FROM community; LOAD cache_prewarm;")
+        for table in PREWARM_TABLES:
+            con.execute("SELECT prewarm(?, 'buffer')", [table])
+    except duckdb.Error:
+        # Community extension unavailable (offline install) - queries still
+        # work, the first ones just read from disk
+        pass
+    return con
+
+# QUERY CACHE
+# Reruns (sidebar / selectbox changes) return cached results instead of
+# re-scanning DuckDB. Results are keyed on (sql, params); max_entries bounds
+# memory for per-sensor variants. Sensor facts refresh every minute, the
+# product dimension only changes on dbt runs.
+@st.cache_data(ttl="1m", max_entries=100)
+def run_query(sql: str, params: tuple = ()) -> pd.DataFrame:
+    """Run a sensor-fact query and return a DataFrame"""
+    return get_database_connection().execute(sql, params).df()
+
+@st.cache_data(ttl="1m", max_entries=100)
+def run_arrow(sql: str, params: tuple = ()) -> pa.Table:
+    """Run a sensor-fact query and return an Arrow table (no pandas conversion)"""
+    result = get_database_connection().execute(sql, params).arrow()
+    # Newer DuckDB returns a RecordBatchReader from .arrow()
+    return result.read_all() if isinstance(result, pa.RecordBatchReader) else result
+
+@st.cache_data(ttl="1m", max_entries=100)
+def run_scalar(sql: str, params: tuple = ()):
+    """Run a sensor-fact query and return the first column of the first row"""
+    return get_database_connection().execute(sql, params).fetchone()[0]
+
+@st.cache_data(ttl="1m", max_entries=100)
+def run_row(sql: str, params: tuple = ()) -> tuple:
+    """Run a sensor-fact query and return the first row"""
+    return get_database_connection().execute(sql, params).fetchone()
+
+@st.cache_data(ttl="15m", max_entries=100)
+def run_dim_query(sql: str, params: tuple = ()) -> pd.DataFrame:
+    """Run a product-dimension query and return a DataFrame"""
+    return get_database_connection().execute(sql, params).df()
+
+@st.cache_data(ttl="15m", max_entries=100)
+def run_dim_scalar(sql: str, params: tuple = ()):
+    """Run a product-dimension query and return the first column of the first row"""
+    return get_database_connection().execute(sql, params).fetchone()[0]
+
+# Reference data: the set of sensors changes at most daily
+@st.cache_data(ttl="1h")
+def get_sensor_ids() -> list:
+    """Sensor IDs for the sensor selector, sorted"""
+    return get_database_connection().execute("""
+        SELECT DISTINCT sensor_id 
+        FROM main_marts.fct_sensor_readings 
+        ORDER BY sensor_id
+    """).df()['sensor_id'].tolist()
+
+# Max points per sensor line in the temperature time series
+TIME_SERIES_MAX_POINTS = 2000
+TIME_BUCKETS = (('minute', 60), ('hour', 3600), ('day', 86400))
+
+def pick_time_bucket(start, end) -> str:
+    """Finest date_trunc part that keeps [start, end] within TIME_SERIES_MAX_POINTS buckets"""
+    if start is None or end is None:
+        return 'minute'
+    span_seconds = (end - start).total_seconds()
+    for bucket, bucket_seconds in TIME_BUCKETS:
+        if span_seconds / bucket_seconds <= TIME_SERIES_MAX_POINTS:
+            return bucket
+    return TIME_BUCKETS[-1][0]
 
 def main():
     st.title("📊 Data Warehouse Analytics Dashboard")
@@ -36,51 +113,52 @@ def main():
         ["🏠 Overview", "🌡️ Sensor Analytics", "📦 Product Analytics", "✅ Data Quality"]
     )
     
-    conn = get_database_connection()
-    
     if page == "🏠 Overview":
-        show_overview(conn)
+        show_overview()
     elif page == "🌡️ Sensor Analytics":
-        show_sensor_analytics(conn)
+        show_sensor_analytics()
     elif page == "📦 Product Analytics":
-        show_product_analytics(conn)
+        show_product_analytics()
     elif page == "✅ Data Quality":
-        show_data_quality(conn)
+        show_data_quality()
 
-def show_overview(conn):
+def show_overview():
     """Overview dashboard with key metrics"""
+    import plotly.express as px
+    
     st.header("System Overview")
     
     # KEY METRICS ROW
+    # Sensor KPIs from the daily rollups (one row per day / sensor-day),
+    # product count from the dimension. COALESCE keeps an empty mart
+    # (fresh warehouse) at 0 instead of NULL
+    total_readings, data_quality = run_row("""
+        SELECT 
+            COALESCE(SUM(total_readings), 0)::BIGINT,
+            COALESCE(ROUND(100.0 * SUM(valid_readings) / NULLIF(SUM(total_readings), 0), 1), 0)
+        FROM main_marts.fct_daily_quality
+    """)
+    total_sensors = run_scalar("""
+        SELECT COUNT(DISTINCT sensor_id)
+        FROM main_marts.fct_sensor_location_daily
+    """)
+    total_products = run_dim_scalar("""
+        SELECT COUNT(*) 
+        FROM main_marts.dim_products
+    """)
+    
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_sensors = conn.execute("""
-            SELECT COUNT(DISTINCT sensor_id) 
-            FROM main_marts.fct_sensor_readings
-        """).fetchone()[0]
         st.metric("Active Sensors", f"{total_sensors:,}")
     
     with col2:
-        total_readings = conn.execute("""
-            SELECT COUNT(*) 
-            FROM main_marts.fct_sensor_readings
-        """).fetchone()[0]
         st.metric("Total Readings", f"{total_readings:,}")
     
     with col3:
-        total_products = conn.execute("""
-            SELECT COUNT(*) 
-            FROM main_marts.dim_products
-        """).fetchone()[0]
         st.metric("Products", f"{total_products:,}")
     
     with col4:
-        data_quality = conn.execute("""
-            SELECT 
-                ROUND(100.0 * SUM(CASE WHEN is_valid_reading THEN 1 ELSE 0 END) / COUNT(*), 1)
-            FROM main_marts.fct_sensor_readings
-        """).fetchone()[0]
         st.metric("Data Quality", f"{data_quality}%")
     
     st.divider()
@@ -90,7 +168,8 @@ def show_overview(conn):
     
     with col1:
         st.subheader("Latest Sensor Readings")
-        latest_readings = conn.execute("""
+        # Streamlit serializes Arrow tables directly
+        latest_readings = run_arrow("""
             SELECT 
                 sensor_id,
                 reading_timestamp,
@@ -100,26 +179,19 @@ def show_overview(conn):
             FROM main_marts.fct_sensor_readings
             ORDER BY reading_timestamp DESC
             LIMIT 10
-        """).df()
+        """)
         st.dataframe(latest_readings, width='stretch', hide_index=True)
     
     with col2:
         st.subheader("Temperature Distribution")
-        temp_dist = conn.execute("""
+        # Pre-aggregated by dbt (one row per category)
+        temp_dist = run_query("""
             SELECT 
                 temperature_category,
-                COUNT(*) as count
-            FROM main_marts.fct_sensor_readings
-            GROUP BY temperature_category
-            ORDER BY 
-                CASE temperature_category
-                    WHEN 'freezing' THEN 1
-                    WHEN 'cold' THEN 2
-                    WHEN 'comfortable' THEN 3
-                    WHEN 'warm' THEN 4
-                    WHEN 'hot' THEN 5
-                END
-        """).df()
+                reading_count as count
+            FROM main_marts.fct_temperature_categories
+            ORDER BY category_order
+        """)
         
         fig = px.bar(
             temp_dist,
@@ -130,57 +202,54 @@ def show_overview(conn):
         )
         st.plotly_chart(fig, width='stretch')
 
-def show_sensor_analytics(conn):
+def show_sensor_analytics():
     """Sensor analytics dashboard"""
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
     st.header("🌡️ Sensor Analytics")
     
     # SENSOR SELECTOR
-    sensors = conn.execute("""
-        SELECT DISTINCT sensor_id 
-        FROM main_marts.fct_sensor_readings 
-        ORDER BY sensor_id
-    """).df()['sensor_id'].tolist()
-    
-    selected_sensor = st.selectbox("Select Sensor", ["All Sensors"] + sensors)
+    selected_sensor = st.selectbox("Select Sensor", ["All Sensors"] + get_sensor_ids())
     
     # METRICS ROW
-    if selected_sensor == "All Sensors":
-        where_clause = ""
-    else:
-        where_clause = f"WHERE sensor_id = '{selected_sensor}'"
+    # Bound parameters, never string-interpolated: one SQL text per metric for
+    # every sensor, and NULL selects all sensors
+    sensor_param = None if selected_sensor == "All Sensors" else selected_sensor
+    params = (sensor_param, sensor_param)
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        reading_count = conn.execute(f"""
+        reading_count = run_scalar("""
             SELECT COUNT(*) 
             FROM main_marts.fct_sensor_readings 
-            {where_clause}
-        """).fetchone()[0]
+            WHERE (? IS NULL OR sensor_id = ?)
+        """, params)
         st.metric("Total Readings", f"{reading_count:,}")
     
     with col2:
-        avg_temp = conn.execute(f"""
+        avg_temp = run_scalar("""
             SELECT ROUND(AVG(temperature), 1)
             FROM main_marts.fct_sensor_readings 
-            {where_clause}
-        """).fetchone()[0]
+            WHERE (? IS NULL OR sensor_id = ?)
+        """, params)
         st.metric("Avg Temperature", f"{avg_temp}°C" if avg_temp else "N/A")
     
     with col3:
-        avg_humidity = conn.execute(f"""
+        avg_humidity = run_scalar("""
             SELECT ROUND(AVG(humidity), 1)
             FROM main_marts.fct_sensor_readings 
-            {where_clause}
-        """).fetchone()[0]
+            WHERE (? IS NULL OR sensor_id = ?)
+        """, params)
         st.metric("Avg Humidity", f"{avg_humidity}%" if avg_humidity else "N/A")
     
     with col4:
-        anomaly_count = conn.execute(f"""
+        anomaly_count = run_scalar("""
             SELECT COUNT(*) 
-            FROM (select * from main_marts.fct_sensor_readings where is_anomaly = TRUE) a 
-            {where_clause}
-        """).fetchone()[0]
+            FROM main_marts.fct_sensor_readings 
+            WHERE is_anomaly = TRUE AND (? IS NULL OR sensor_id = ?)
+        """, params)
         st.metric("Anomalies", f"{anomaly_count:,}")
     
     st.divider()
@@ -188,25 +257,49 @@ def show_sensor_analytics(conn):
     # TIME SERIES CHART
     st.subheader("Temperature Over Time")
     
-    time_series = conn.execute(f"""
+    # Downsample in DuckDB: pick the finest bucket that keeps each sensor's
+    # line under TIME_SERIES_MAX_POINTS, so raw rows never reach the browser
+    first_ts, last_ts = run_row("""
+        SELECT MIN(reading_timestamp), MAX(reading_timestamp)
+        FROM main_marts.fct_sensor_readings
+        WHERE (? IS NULL OR sensor_id = ?)
+    """, params)
+    bucket = pick_time_bucket(first_ts, last_ts)
+    
+    time_series = run_arrow("""
         SELECT 
-            reading_timestamp,
-            temperature,
-            humidity,
+            date_trunc(?, reading_timestamp)::TIMESTAMP as reading_timestamp,
+            ROUND(AVG(temperature), 2) as temperature,
+            ROUND(AVG(humidity), 2) as humidity,
             sensor_id
         FROM main_marts.fct_sensor_readings
-        {where_clause}
-        ORDER BY reading_timestamp
-    """).df()
-    
-    if not time_series.empty:
-        fig = px.line(
-            time_series,
-            x='reading_timestamp',
-            y='temperature',
-            color='sensor_id' if selected_sensor == "All Sensors" else None,
+        WHERE (? IS NULL OR sensor_id = ?)
+        GROUP BY 1, sensor_id
+        ORDER BY 1
+    """, (bucket, *params))
+    
+    if time_series.num_rows:
+        # WebGL traces (one per sensor) instead of SVG for long time series.
+        # Arrow columns go straight to numpy (naive datetime64, cast in SQL),
+        # with no pandas DataFrame in between
+        # Dictionary-encode sensor_id once, then split traces by integer code
+        # instead of comparing every row's string per sensor
+        sensor_codes = time_series['sensor_id'].combine_chunks().dictionary_encode()
+        fig = go.Figure()
+        for code, sensor_id in enumerate(sensor_codes.dictionary.to_pylist()):
+            sensor_series = time_series.filter(pc.equal(sensor_codes.indices, code))
+            fig.add_trace(go.Scattergl(
+                x=sensor_series['reading_timestamp'].to_numpy(),
+                y=sensor_series['temperature'].to_numpy(),
+                mode='lines',
+                name=sensor_id
+            ))
+        fig.update_layout(
             title='Temperature Readings',
-            labels={'reading_timestamp': 'Time', 'temperature': 'Temperature (°C)'}
+            xaxis_title='Time',
+            yaxis_title='Temperature (°C)',
+            legend_title_text='sensor_id',
+            showlegend=selected_sensor == "All Sensors"
         )
         st.plotly_chart(fig, width='stretch')
     
@@ -215,37 +308,43 @@ def show_sensor_analytics(conn):
     
     with col1:
         st.subheader("Hourly Temperature Pattern")
-        hourly_temp = conn.execute(f"""
+        # Hourly rollup from dbt: at most 24 rows per sensor. Re-average from
+        # sums/counts so "All Sensors" weights each reading equally
+        hourly_temp = run_query("""
             SELECT 
                 reading_hour,
-                ROUND(AVG(temperature), 1) as avg_temp
-            FROM main_marts.fct_sensor_readings
-            {where_clause}
+                ROUND(SUM(temperature_sum) / SUM(temperature_count), 1) as avg_temp
+            FROM main_marts.fct_sensor_hourly
+            WHERE (? IS NULL OR sensor_id = ?)
             GROUP BY reading_hour
             ORDER BY reading_hour
-        """).df()
+        """, params)
         
         if not hourly_temp.empty:
-            fig = px.line(
-                hourly_temp,
-                x='reading_hour',
-                y='avg_temp',
+            # 24 points: an SVG line is enough, WebGL only pays off for long series
+            fig = go.Figure(go.Scatter(
+                x=hourly_temp['reading_hour'].to_numpy(),
+                y=hourly_temp['avg_temp'].to_numpy(),
+                mode='lines'
+            ))
+            fig.update_layout(
                 title='Average Temperature by Hour',
-                labels={'reading_hour': 'Hour of Day', 'avg_temp': 'Avg Temp (°C)'}
+                xaxis_title='Hour of Day',
+                yaxis_title='Avg Temp (°C)'
             )
             st.plotly_chart(fig, width='stretch')
     
     with col2:
         st.subheader("Location Distribution")
-        location_dist = conn.execute(f"""
+        location_dist = run_query("""
             SELECT 
                 location,
-                COUNT(*) as count
-            FROM main_marts.fct_sensor_readings
-            {where_clause}
+                SUM(reading_count)::BIGINT as count
+            FROM main_marts.fct_sensor_location_daily
+            WHERE (? IS NULL OR sensor_id = ?)
             GROUP BY location
             ORDER BY count DESC
-        """).df()
+        """, params)
         
         if not location_dist.empty:
             fig = px.pie(
@@ -256,40 +355,42 @@ def show_sensor_analytics(conn):
             )
             st.plotly_chart(fig, width='stretch')
 
-def show_product_analytics(conn):
+def show_product_analytics():
     """Product analytics dashboard"""
+    import plotly.express as px
+    
     st.header("📦 Product Analytics")
     
     # METRICS ROW
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_products = conn.execute("""
+        total_products = run_dim_scalar("""
             SELECT COUNT(*) 
             FROM main_marts.dim_products
-        """).fetchone()[0]
+        """)
         st.metric("Total Products", f"{total_products:,}")
     
     with col2:
-        avg_price = conn.execute("""
+        avg_price = run_dim_scalar("""
             SELECT ROUND(AVG(price), 2)
             FROM main_marts.dim_products
-        """).fetchone()[0]
+        """)
         st.metric("Avg Price", f"${avg_price:,.2f}")
     
     with col3:
-        total_stock = conn.execute("""
+        total_stock = run_dim_scalar("""
             SELECT SUM(stock_quantity)
             FROM main_marts.dim_products
-        """).fetchone()[0]
+        """)
         st.metric("Total Stock", f"{total_stock:,}")
     
     with col4:
-        low_stock_count = conn.execute("""
+        low_stock_count = run_dim_scalar("""
             SELECT COUNT(*)
             FROM main_marts.dim_products
             WHERE stock_status IN ('low_stock', 'out_of_stock')
-        """).fetchone()[0]
+        """)
         st.metric("Low/Out of Stock", f"{low_stock_count:,}")
     
     st.divider()
@@ -299,7 +400,7 @@ def show_product_analytics(conn):
     
     with col1:
         st.subheader("Products by Price Tier")
-        price_tier = conn.execute("""
+        price_tier = run_dim_query("""
             SELECT 
                 price_tier,
                 COUNT(*) as count,
@@ -313,7 +414,7 @@ def show_product_analytics(conn):
                     WHEN 'premium' THEN 3
                     WHEN 'luxury' THEN 4
                 END
-        """).df()
+        """)
         
         fig = px.bar(
             price_tier,
@@ -326,7 +427,7 @@ def show_product_analytics(conn):
     
     with col2:
         st.subheader("Stock Status")
-        stock_status = conn.execute("""
+        stock_status = run_dim_query("""
             SELECT 
                 stock_status,
                 COUNT(*) as count
@@ -339,7 +440,7 @@ def show_product_analytics(conn):
                     WHEN 'normal_stock' THEN 3
                     WHEN 'high_stock' THEN 4
                 END
-        """).df()
+        """)
         
         fig = px.pie(
             stock_status,
@@ -351,7 +452,7 @@ def show_product_analytics(conn):
     
     # CATEGORY ANALYSIS
     st.subheader("Category Breakdown")
-    category_data = conn.execute("""
+    category_data = run_dim_query("""
         SELECT 
             category,
             COUNT(*) as product_count,
@@ -360,25 +461,27 @@ def show_product_analytics(conn):
         FROM main_marts.dim_products
         GROUP BY category
         ORDER BY product_count DESC
-    """).df()
+    """)
     
     st.dataframe(category_data, width='stretch', hide_index=True)
 
-def show_data_quality(conn):
+def show_data_quality():
     """Data quality monitoring dashboard"""
+    import plotly.express as px
+    
     st.header("✅ Data Quality Monitoring")
     
     # OVERALL QUALITY METRICS
     col1, col2, col3, col4 = st.columns(4)
     
-    quality_stats = conn.execute("""
+    quality_stats = run_row("""
         SELECT 
-            COUNT(*) as total,
-            SUM(CASE WHEN is_valid_reading THEN 1 ELSE 0 END) as valid,
-            SUM(CASE WHEN is_anomaly THEN 1 ELSE 0 END) as anomalies,
-            SUM(CASE WHEN has_missing_data THEN 1 ELSE 0 END) as missing
-        FROM main_marts.fct_sensor_readings
-    """).fetchone()
+            COALESCE(SUM(total_readings), 0)::BIGINT as total,
+            COALESCE(SUM(valid_readings), 0)::BIGINT as valid,
+            COALESCE(SUM(anomalies), 0)::BIGINT as anomalies,
+            COALESCE(SUM(missing_readings), 0)::BIGINT as missing
+        FROM main_marts.fct_daily_quality
+    """)
     
     total, valid, anomalies, missing = quality_stats
     
@@ -400,14 +503,14 @@ def show_data_quality(conn):
     # DAILY QUALITY TREND
     st.subheader("Daily Data Quality Trend")
     
-    daily_quality = conn.execute("""
+    # Pre-aggregated by dbt: one row per day
+    daily_quality = run_query("""
         SELECT 
             reading_date,
-            ROUND(100 * SUM(CASE WHEN is_valid_reading THEN 1 ELSE 0 END) / COUNT(*), 2) as quality_pct
-        FROM main_marts.fct_sensor_readings
-        GROUP BY reading_date
+            ROUND(100 * valid_readings / total_readings, 2) as quality_pct
+        FROM main_marts.fct_daily_quality
         ORDER BY reading_date
-    """).df()
+    """)
     
     if not daily_quality.empty:
         fig = px.line(
@@ -425,7 +528,7 @@ def show_data_quality(conn):
     
     with col1:
         st.subheader("Anomalies by Sensor")
-        anomaly_by_sensor = conn.execute("""
+        anomaly_by_sensor = run_query("""
             SELECT 
                 sensor_id,
                 COUNT(*) as anomaly_count
@@ -433,7 +536,7 @@ def show_data_quality(conn):
             WHERE is_anomaly = TRUE
             GROUP BY sensor_id
             ORDER BY anomaly_count DESC
-        """).df()
+        """)
         
         if not anomaly_by_sensor.empty:
             fig = px.bar(
@@ -449,7 +552,7 @@ def show_data_quality(conn):
     
     with col2:
         st.subheader("Data Completeness")
-        completeness = conn.execute("""
+        completeness = run_query("""
             SELECT 
                 CASE 
                     WHEN has_missing_data THEN 'Incomplete'
@@ -462,7 +565,7 @@ def show_data_quality(conn):
                     WHEN has_missing_data THEN 'Incomplete'
                     ELSE 'Complete'
                 END
-        """).df()
+        """)
         
         if not completeness.empty:
             fig = px.pie(
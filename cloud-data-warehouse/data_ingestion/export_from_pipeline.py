@@ -22,9 +22,15 @@ This would be an Airflow DAG running daily, writing to S3 instead of local files
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
+import duckdb
 import psycopg2
+import psycopg2.pool
 import pandas as pd
-from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import yaml
 
@@ -50,6 +56,67 @@ class PipelineDataExporter:
         
         self.data_lake_path = Path(self.config['data_lake']['base_path'])
         self.setup_data_lake_structure()
+        
+        # Parquet writer settings shared by the DuckDB and pandas paths
+        export_settings = self.config.get('export_settings', {})
+        self.compression = export_settings.get('compression', 'zstd')
+        # Only zstd/gzip/brotli take a level; leave unset for snappy
+        self.compression_level = export_settings.get('compression_level')
+        self.row_group_size = export_settings.get('row_group_size', 128_000)
+        
+        # One pool per database: connections are opened on first use and then
+        # reused by every query and every run_full_export() on this exporter
+        self._pg_pool = self._create_pool('postgres')
+        self._ts_pool = self._create_pool('timescaledb')
+        
+        self._start_run()
+        
+        # DuckDB with both databases attached (created on first export;
+        # False once we know the postgres extension is unavailable)
+        self._duck = None
+    
+    def _create_pool(self, database_key, max_connections=4):
+        """Thread-safe connection pool for one of the configured databases"""
+        db = self.config['databases'][database_key]
+        return psycopg2.pool.ThreadedConnectionPool(
+            0,
+            max_connections,
+            host=db['host'],
+            port=db['port'],
+            database=db['database'],
+            user=db['user'],
+            password=db['password']
+        )
+    
+    @staticmethod
+    @contextmanager
+    def _pooled_connection(pool):
+        """Borrow a connection from the pool and hand it back afterwards"""
+        conn = pool.getconn()
+        try:
+            yield conn
+        finally:
+            # End the read-only transaction pandas left open before reuse
+            conn.rollback()
+            pool.putconn(conn)
+    
+    def _start_run(self):
+        """
+        Stamp the current export run
+        
+        Every file of one run is named from the same timestamp, so a run
+        that straddles midnight doesn't split its files across two days.
+        """
+        self._run_ts = datetime.now()
+        self._run_day = self._run_ts.strftime("%Y%m%d")
+    
+    def close(self):
+        """Close all pooled database connections"""
+        self._pg_pool.closeall()
+        self._ts_pool.closeall()
+        if self._duck:
+            self._duck.close()
+        self._duck = None
     
     def setup_data_lake_structure(self):
         """
@@ -79,14 +146,10 @@ class PipelineDataExporter:
         
         This connects to the database from your first project where
         your Airflow pipeline stores clean product data
+        
+        Use as a context manager; the connection goes back to the pool on exit
         """
-        return psycopg2.connect(
-            host=self.config['databases']['postgres']['host'],
-            port=self.config['databases']['postgres']['port'],
-            database=self.config['databases']['postgres']['database'],
-            user=self.config['databases']['postgres']['user'],
-            password=self.config['databases']['postgres']['password']
-        )
+        return self._pooled_connection(self._pg_pool)
     
     def get_timescaledb_connection(self):
         """
@@ -94,14 +157,161 @@ class PipelineDataExporter:
         
         This connects to the database from your first project where
         your Kafka consumer stores sensor readings
+        
+        Use as a context manager; the connection goes back to the pool on exit
         """
-        return psycopg2.connect(
-            host=self.config['databases']['timescaledb']['host'],
-            port=self.config['databases']['timescaledb']['port'],
-            database=self.config['databases']['timescaledb']['database'],
-            user=self.config['databases']['timescaledb']['user'],
-            password=self.config['databases']['timescaledb']['password']
-        )
+        return self._pooled_connection(self._ts_pool)
+    
+    # Attach alias used by DuckDB's postgres extension for each database
+    DUCKDB_ALIASES = {'postgres': 'pg', 'timescaledb': 'ts'}
+    
+    # Rows fetched per round trip (and written per row group) by the pandas fallback
+    FETCH_BATCH_SIZE = 50_000
+    
+    def get_duckdb_connection(self):
+        """
+        DuckDB connection with both pipeline databases attached read-only
+        
+        Returns None when the postgres extension can't be loaded (e.g. no
+        network for INSTALL); exports then fall back to pandas.
+        """
+        if self._duck is None:
+            con = duckdb.connect()
+            try:
+                con.execute("INSTALL postgres; LOAD postgres;")
+            except duckdb.Error as e:
+                print(f"  ⚠️  DuckDB postgres extension unavailable, exporting via pandas: {e}")
+                con.close()
+                self._duck = False
+                return None
+            
+            # Read PostgreSQL results with COPY ... TO STDOUT (FORMAT BINARY),
+            # decoded in C++, instead of the text protocol (the extension's
+            # default, pinned here so a global setting can't switch it off)
+            con.execute("SET pg_use_binary_copy = true")
+            
+            for database_key, alias in self.DUCKDB_ALIASES.items():
+                db = self.config['databases'][database_key]
+                con.execute(f"""
+                    ATTACH 'host={db['host']} port={db['port']} dbname={db['database']} user={db['user']} password={db['password']}'
+                    AS {alias} (TYPE POSTGRES, READ_ONLY)
+                """)
+            self._duck = con
+        
+        return self._duck or None
+    
+    def export_query(self, database_key, query, output_path, duckdb_query=None):
+        """
+        Run a query on one of the pipeline databases and write the result to parquet
+        
+        WHY DUCKDB?
+        - postgres_query() runs the SQL as-is on the source database,
+          wrapped in a binary COPY TO STDOUT
+        - COPY ... TO streams the rows into parquet in C++, without
+          building a pandas DataFrame of Python objects first
+        
+        Args:
+            database_key: 'postgres' or 'timescaledb'
+            query: PostgreSQL query (also used by the pandas fallback)
+            duckdb_query: Optional DuckDB SQL over the attached tables
+                (pg.* / ts.*), used instead of query when DuckDB is available
+        
+        Returns:
+            Number of rows exported
+        """
+        con = self.get_duckdb_connection()
+        
+        if con is None:
+            get_connection = {
+                'postgres': self.get_postgres_connection,
+                'timescaledb': self.get_timescaledb_connection,
+            }[database_key]
+            with get_connection() as conn:
+                return self._stream_query_to_parquet(conn, query, output_path)
+        
+        if duckdb_query is not None:
+            source = f"({duckdb_query})"
+        else:
+            escaped_query = query.replace("'", "''")
+            source = f"postgres_query('{self.DUCKDB_ALIASES[database_key]}', '{escaped_query}')"
+        
+        # Each export thread needs its own DuckDB cursor
+        with con.cursor() as cur:
+            # Keep the schema pandas used to write (NUMERIC -> DOUBLE, INTEGER ->
+            # BIGINT) so daily files globbed together by dbt stay compatible
+            select_list = []
+            for name, column_type, *_ in cur.execute(f"DESCRIBE SELECT * FROM {source}").fetchall():
+                if column_type.startswith('DECIMAL'):
+                    select_list.append(f'CAST("{name}" AS DOUBLE) AS "{name}"')
+                elif column_type in ('TINYINT', 'SMALLINT', 'INTEGER'):
+                    select_list.append(f'CAST("{name}" AS BIGINT) AS "{name}"')
+                else:
+                    select_list.append(f'"{name}"')
+            
+            copy_options = [
+                'FORMAT PARQUET',
+                f"COMPRESSION '{self.compression}'",
+                f'ROW_GROUP_SIZE {self.row_group_size}',
+            ]
+            if self.compression_level is not None:
+                copy_options.append(f'COMPRESSION_LEVEL {self.compression_level}')
+            
+            return cur.execute(f"""
+                COPY (SELECT {', '.join(select_list)} FROM {source})
+                TO '{output_path}' ({', '.join(copy_options)})
+            """).fetchone()[0]
+    
+    def _parquet_options(self):
+        """
+        pyarrow writer options matching the DuckDB COPY settings
+        
+        Dictionary encoding stores repeated strings (sensor_id, location,
+        category, source) once per column chunk instead of once per row.
+        """
+        options = {
+            'compression': self.compression,
+            'use_dictionary': True,
+            'data_page_size': 1 << 20,
+        }
+        if self.compression_level is not None:
+            options['compression_level'] = self.compression_level
+        return options
+    
+    def _stream_query_to_parquet(self, conn, query, output_path):
+        """
+        Write a query result to parquet one batch at a time
+        
+        A named (server-side) cursor keeps the result set in PostgreSQL, so
+        peak memory is one FETCH_BATCH_SIZE batch instead of the whole table.
+        """
+        writer = None
+        row_count = 0
+        
+        try:
+            with conn.cursor(name='parquet_export') as cur:
+                cur.itersize = self.FETCH_BATCH_SIZE
+                cur.execute(query)
+                
+                while rows := cur.fetchmany(self.FETCH_BATCH_SIZE):
+                    columns = [col.name for col in cur.description]
+                    # coerce_float turns NUMERIC (Decimal) into float64, like read_sql
+                    df = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+                    batch = pa.Table.from_pandas(df, preserve_index=False)
+                    
+                    if writer is None:
+                        writer = pq.ParquetWriter(output_path, batch.schema, **self._parquet_options())
+                    writer.write_table(batch.cast(writer.schema), row_group_size=self.row_group_size)
+                    row_count += len(rows)
+                
+                if writer is None:
+                    # Empty result: still write a file with the right columns
+                    columns = [col.name for col in cur.description]
+                    pd.DataFrame(columns=columns).to_parquet(output_path, index=False, **self._parquet_options())
+        finally:
+            if writer is not None:
+                writer.close()
+        
+        return row_count
     
     def export_batch_data(self):
         """
@@ -123,8 +333,6 @@ class PipelineDataExporter:
         """
         print("\n📦 Exporting batch pipeline data...")
         
-        conn = self.get_postgres_connection()
-        
         # Export clean products
         # Columns match your actual schema from init.sql
         query = """
@@ -140,10 +348,9 @@ class PipelineDataExporter:
         ORDER BY loaded_at DESC
         """
         
-        df = pd.read_sql(query, conn)
-        output_path = self.data_lake_path / 'raw' / 'batch' / f'clean_products_{datetime.now().strftime("%Y%m%d")}.parquet'
-        df.to_parquet(output_path, index=False)
-        print(f"  ✅ Exported {len(df)} clean products to {output_path.name}")
+        output_path = self.data_lake_path / 'raw' / 'batch' / f'clean_products_{self._run_day}.parquet'
+        row_count = self.export_query('postgres', query, output_path)
+        print(f"  ✅ Exported {row_count} clean products to {output_path.name}")
         
         # Export quarantined data (for quality analysis)
         # These are records that failed validation
@@ -157,16 +364,112 @@ class PipelineDataExporter:
         ORDER BY quarantined_at DESC
         """
         
-        df = pd.read_sql(query, conn)
-        
         # Note: raw_data is JSONB in PostgreSQL, which we cast to text
         # In the warehouse, we'll parse it back to JSON when needed
+        # With DuckDB the JSONB arrives over binary COPY and is cast to
+        # text in DuckDB's vectorized executor instead of by the server
+        duckdb_query = """
+        SELECT 
+            id,
+            CAST(raw_data AS VARCHAR) as raw_data,
+            issues,
+            quarantined_at
+        FROM pg.public.quarantine_products
+        ORDER BY quarantined_at DESC
+        """
+        
+        output_path = self.data_lake_path / 'raw' / 'batch' / f'quarantine_products_{self._run_day}.parquet'
+        row_count = self.export_query('postgres', query, output_path, duckdb_query)
+        print(f"  ✅ Exported {row_count} quarantined products to {output_path.name}")
+    
+    def query_scalar(self, database_key, query):
+        """Run a PostgreSQL query on one of the pipeline databases and return one value"""
+        con = self.get_duckdb_connection()
+        
+        if con is None:
+            get_connection = {
+                'postgres': self.get_postgres_connection,
+                'timescaledb': self.get_timescaledb_connection,
+            }[database_key]
+            with get_connection() as conn, conn.cursor() as cur:
+                cur.execute(query)
+                return cur.fetchone()[0]
+        
+        escaped_query = query.replace("'", "''")
+        with con.cursor() as cur:
+            return cur.execute(
+                f"SELECT * FROM postgres_query('{self.DUCKDB_ALIASES[database_key]}', '{escaped_query}')"
+            ).fetchone()[0]
+    
+    def export_daily_partitions(self, database_key, table, query, duckdb_query=None):
+        """
+        Export the streaming lookback window as one parquet partition per UTC day
         
-        output_path = self.data_lake_path / 'raw' / 'batch' / f'quarantine_products_{datetime.now().strftime("%Y%m%d")}.parquet'
-        df.to_parquet(output_path, index=False)
-        print(f"  ✅ Exported {len(df)} quarantined products to {output_path.name}")
+        Layout (Hive-style, like S3 data lakes):
+            raw/streaming/<table>/date=YYYY-MM-DD/part.parquet
         
-        conn.close()
+        WHY PARTITION?
+        - A single file per run re-wrote the whole 7-day window every time
+        - Past days rarely change, so a day whose source rows still match
+          the checksum recorded next to its partition (_signature) is skipped
+        - The checksum covers row contents, so an in-place UPDATE or a
+          correction that keeps the row count still gets re-exported
+        - Usually only today's partition gets rewritten
+        
+        Single-file exports from before partitioning (<table>_YYYYMMDD.parquet)
+        are no longer read by dbt but are left in place, since raw/ is
+        immutable.
+        
+        query / duckdb_query filter on {start} and {end} (UTC day bounds).
+        
+        Returns:
+            (rows exported, partitions written, partitions unchanged)
+        """
+        lookback_days = self.config.get('export_settings', {}).get('streaming_lookback_days', 7)
+        today = self._run_ts.astimezone(timezone.utc).date()
+        
+        streaming_dir = self.data_lake_path / 'raw' / 'streaming'
+        
+        rows_exported = written = unchanged = 0
+        for days_ago in range(lookback_days, -1, -1):
+            day = today - timedelta(days=days_ago)
+            bounds = {
+                'start': f'{day} 00:00:00+00',
+                'end': f'{day + timedelta(days=1)} 00:00:00+00',
+            }
+            output_path = streaming_dir / table / f'date={day}' / 'part.parquet'
+            signature_path = output_path.with_name('_signature')
+            
+            # Row count plus an order-independent sum of per-row md5 hashes
+            source_signature = self.query_scalar(database_key, f"""
+                SELECT COUNT(*) || ':' || COALESCE(SUM(('x' || left(md5(t::text), 16))::bit(64)::bigint), 0)
+                FROM {table} t
+                WHERE time >= TIMESTAMPTZ '{bounds['start']}' AND time < TIMESTAMPTZ '{bounds['end']}'
+            """)
+            if output_path.exists():
+                partition_unchanged = (
+                    signature_path.exists() and signature_path.read_text() == source_signature
+                )
+            else:
+                # No need to write empty partitions for days without data
+                partition_unchanged = source_signature == '0:0'
+            if partition_unchanged:
+                unchanged += 1
+                continue
+            
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            # Invalidate first so a failed write is retried on the next run
+            signature_path.unlink(missing_ok=True)
+            rows_exported += self.export_query(
+                database_key,
+                query.format(**bounds),
+                output_path,
+                duckdb_query.format(**bounds) if duckdb_query else None,
+            )
+            signature_path.write_text(source_signature)
+            written += 1
+        
+        return rows_exported, written, unchanged
     
     def export_streaming_data(self):
         """
@@ -176,7 +479,8 @@ class PipelineDataExporter:
         1. Connects to TimescaleDB
         2. Queries sensor_readings (valid data)
         3. Queries sensor_readings_invalid (failed validations)
-        4. Exports last 7 days by default (configurable)
+        4. Exports last 7 days by default (streaming_lookback_days in config)
+        5. Writes one partition per day, skipping days whose contents haven't changed
         
         WHY LAST 7 DAYS?
         - Streaming data grows quickly
@@ -190,9 +494,7 @@ class PipelineDataExporter:
         """
         print("\n🌊 Exporting streaming pipeline data...")
         
-        conn = self.get_timescaledb_connection()
-        
-        # Export sensor readings (last 7 days by default)
+        # Export sensor readings (last 7 days by default, one day per query)
         # Columns match your actual schema from init.sql
         query = """
         SELECT 
@@ -203,14 +505,13 @@ class PipelineDataExporter:
             pressure,
             location
         FROM sensor_readings
-        WHERE time >= NOW() - INTERVAL '7 days'
+        WHERE time >= TIMESTAMPTZ '{start}' AND time < TIMESTAMPTZ '{end}'
         ORDER BY time DESC
         """
         
-        df = pd.read_sql(query, conn)
-        output_path = self.data_lake_path / 'raw' / 'streaming' / f'sensor_readings_{datetime.now().strftime("%Y%m%d")}.parquet'
-        df.to_parquet(output_path, index=False)
-        print(f"  ✅ Exported {len(df)} sensor readings to {output_path.name}")
+        row_count, written, unchanged = self.export_daily_partitions('timescaledb', 'sensor_readings', query)
+        print(f"  ✅ Exported {row_count} sensor readings to sensor_readings/ "
+              f"({written} partitions written, {unchanged} unchanged)")
         
         # Export invalid sensor readings
         # These are readings that failed validation
@@ -221,20 +522,29 @@ class PipelineDataExporter:
             raw_data::text as raw_data,
             issues
         FROM sensor_readings_invalid
-        WHERE time >= NOW() - INTERVAL '7 days'
+        WHERE time >= TIMESTAMPTZ '{start}' AND time < TIMESTAMPTZ '{end}'
         ORDER BY time DESC
         """
         
-        df = pd.read_sql(query, conn)
-        
         # Note: raw_data is JSONB in TimescaleDB, which we cast to text
         # In the warehouse, we'll parse it back to JSON when needed
+        # (in DuckDB when available, as for quarantined products)
+        duckdb_query = """
+        SELECT 
+            time,
+            sensor_id,
+            CAST(raw_data AS VARCHAR) as raw_data,
+            issues
+        FROM ts.public.sensor_readings_invalid
+        WHERE time >= TIMESTAMPTZ '{start}' AND time < TIMESTAMPTZ '{end}'
+        ORDER BY time DESC
+        """
         
-        output_path = self.data_lake_path / 'raw' / 'streaming' / f'sensor_readings_invalid_{datetime.now().strftime("%Y%m%d")}.parquet'
-        df.to_parquet(output_path, index=False)
-        print(f"  ✅ Exported {len(df)} invalid sensor readings to {output_path.name}")
-        
-        conn.close()
+        row_count, written, unchanged = self.export_daily_partitions(
+            'timescaledb', 'sensor_readings_invalid', query, duckdb_query
+        )
+        print(f"  ✅ Exported {row_count} invalid sensor readings to sensor_readings_invalid/ "
+              f"({written} partitions written, {unchanged} unchanged)")
     
     def export_metadata(self):
         """
@@ -250,7 +560,7 @@ class PipelineDataExporter:
         
         # Create metadata about this export
         metadata = {
-            'export_timestamp': datetime.now().isoformat(),
+            'export_timestamp': self._run_ts.isoformat(),
             'source_project': 'data-pipeline-exploration',
             'exporter_version': '1.0.0',
             'data_lake_path': str(self.data_lake_path)
@@ -258,8 +568,8 @@ class PipelineDataExporter:
         
         # Save as parquet (consistent with rest of data lake)
         metadata_df = pd.DataFrame([metadata])
-        output_path = self.data_lake_path / 'raw' / 'metadata' / f'export_metadata_{datetime.now().strftime("%Y%m%d_%H%M%S")}.parquet'
-        metadata_df.to_parquet(output_path, index=False)
+        output_path = self.data_lake_path / 'raw' / 'metadata' / f'export_metadata_{self._run_ts.strftime("%Y%m%d_%H%M%S")}.parquet'
+        metadata_df.to_parquet(output_path, index=False, **self._parquet_options())
         print(f"  ✅ Exported metadata to {output_path.name}")
     
     def run_full_export(self):
@@ -272,13 +582,24 @@ class PipelineDataExporter:
         print("🚀 Starting Pipeline Data Export")
         print("=" * 60)
         
-        start_time = datetime.now()
+        self._start_run()
+        start_time = self._run_ts
         
         try:
-            # Export data from both pipelines
-            self.export_batch_data()
-            self.export_streaming_data()
-            self.export_metadata()
+            # Open DuckDB up front so the export threads don't race to attach
+            self.get_duckdb_connection()
+            
+            # Export data from both pipelines. The phases read from different
+            # databases and write different files, so they run in parallel
+            # (psycopg2, DuckDB and pyarrow all release the GIL during I/O)
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                futures = [
+                    executor.submit(self.export_batch_data),
+                    executor.submit(self.export_streaming_data),
+                    executor.submit(self.export_metadata),
+                ]
+                for future in futures:
+                    future.result()
             
             duration = (datetime.now() - start_time).total_seconds()
             
@@ -303,7 +624,10 @@ def main():
     This is what runs when you execute: python export_from_pipeline.py
     """
     exporter = PipelineDataExporter()
-    exporter.run_full_export()
+    try:
+        exporter.run_full_export()
+    finally:
+        exporter.close()
 
 
 # Standard Python pattern - only runs if script is executed directly
@@ -0,0 +1,28 @@
+-- Aggregate fact table: Daily data quality
+-- Purpose: Pre-aggregated quality counts for the overview and data quality pages
+-- Grain: One row per reading_date
+
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- WHY PRE-AGGREGATE?
+-- - Quality KPIs and the daily trend change only when new readings arrive
+-- - One row per day instead of one per reading
+-- - Counts (not percentages) so days can be summed into overall totals
+
+WITH sensor_readings AS (
+    SELECT * FROM {{ ref('fct_sensor_readings') }}
+)
+
+SELECT
+    reading_date,
+    COUNT(*) AS total_readings,
+    SUM(CASE WHEN is_valid_reading THEN 1 ELSE 0 END) AS valid_readings,
+    SUM(CASE WHEN is_anomaly THEN 1 ELSE 0 END) AS anomalies,
+    SUM(CASE WHEN has_missing_data THEN 1 ELSE 0 END) AS missing_readings
+
+FROM sensor_readings
+GROUP BY reading_date
\ No newline at end of file
@@ -0,0 +1,34 @@
+-- Aggregate fact table: Hourly sensor rollup
+-- Purpose: Pre-aggregated readings for the dashboard's hourly pattern chart
+-- Grain: One row per sensor per hour of day (0-23)
+
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- WHY PRE-AGGREGATE?
+-- - The dashboard groups by reading_hour on every rerun
+-- - At most 24 rows per sensor, instead of scanning every reading
+-- - Sums and counts (not averages) so rows can be re-combined across sensors
+
+WITH sensor_readings AS (
+    SELECT * FROM {{ ref('fct_sensor_readings') }}
+)
+
+SELECT
+    sensor_id,
+    reading_hour,
+    
+    -- Row count matches COUNT(*) on the fact table
+    COUNT(*) AS reading_count,
+    
+    -- AVG(temperature) for any set of sensors = SUM(temperature_sum) / SUM(temperature_count)
+    -- (COUNT(temperature) skips NULLs, like AVG does)
+    SUM(temperature) AS temperature_sum,
+    COUNT(temperature) AS temperature_count,
+    AVG(temperature) AS avg_temperature
+
+FROM sensor_readings
+GROUP BY sensor_id, reading_hour
\ No newline at end of file
@@ -0,0 +1,27 @@
+-- Aggregate fact table: Daily readings per sensor and location
+-- Purpose: Pre-aggregated counts for the dashboard's location distribution
+-- Grain: One row per sensor per location per day
+
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+-- WHY PRE-AGGREGATE?
+-- - The dashboard groups by location on every rerun
+-- - One row per sensor/location/day instead of one per reading
+-- - Keeps sensor_id and reading_date so the rollup can still be filtered
+
+WITH sensor_readings AS (
+    SELECT * FROM {{ ref('fct_sensor_readings') }}
+)
+
+SELECT
+    sensor_id,
+    location,
+    reading_date,
+    COUNT(*) AS reading_count
+
+FROM sensor_readings
+GROUP BY sensor_id, location, reading_date
\ No newline at end of file
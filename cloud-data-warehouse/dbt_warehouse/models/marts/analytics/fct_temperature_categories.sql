@@ -0,0 +1,29 @@
+-- Aggregate fact table: Readings per temperature category
+-- Purpose: Pre-aggregated counts for the dashboard's temperature distribution
+-- Grain: One row per temperature_category (at most 5 rows)
+
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+WITH sensor_readings AS (
+    SELECT * FROM {{ ref('fct_sensor_readings') }}
+)
+
+SELECT
+    temperature_category,
+    COUNT(*) AS reading_count,
+    
+    -- Display order (coldest to hottest) for charts
+    CASE temperature_category
+        WHEN 'freezing' THEN 1
+        WHEN 'cold' THEN 2
+        WHEN 'comfortable' THEN 3
+        WHEN 'warm' THEN 4
+        WHEN 'hot' THEN 5
+    END AS category_order
+
+FROM sensor_readings
+GROUP BY temperature_category
\ No newline at end of file
@@ -9,7 +9,8 @@
 
 WITH source AS (
     -- Read parquet files directly from data lake
-    SELECT * FROM read_parquet('../data_lake/raw/streaming/sensor_readings_[0-9]*.parquet')
+    -- One partition per day (date=YYYY-MM-DD/part.parquet), each day exported once
+    SELECT * FROM read_parquet('../data_lake/raw/streaming/sensor_readings/date=*/part.parquet')
 ),
 
 renamed AS (
@@ -1,6 +1,6 @@
 """
 Product Batch Pipeline DAG
-Orchestrates: Scrape → Load Raw → Validate → Load Clean/Quarantine → Report
+Orchestrates: Scrape → Load Raw → Validate → Load Clean/Quarantine → Report → Clean Up Staging
 
 Schedule: Daily at 2 AM
 """
@@ -9,10 +9,10 @@ from airflow import DAG
 from airflow.operators.python import PythonOperator
 from airflow.providers.postgres.operators.postgres import PostgresOperator
 from airflow.providers.postgres.hooks.postgres import PostgresHook
+from psycopg2.extras import Json, execute_values
 from datetime import datetime, timedelta
 import sys
 import os
-import json
 
 # Add batch_pipeline to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'batch_pipeline'))
@@ -31,6 +31,10 @@ default_args = {
     'retry_delay': timedelta(minutes=5),
 }
 
+# Staging rows older than this belong to runs that never reached
+# cleanup_staging (daily schedule, so no live run is that old)
+STAGING_RETENTION = timedelta(days=1)
+
 # Define the DAG
 dag = DAG(
     'product_batch_pipeline',
@@ -90,25 +94,20 @@ def load_to_raw_zone(**context):
     cursor = conn.cursor()
     
     # Insert into raw_products
+    # One statement for the whole batch: the per-row columns go in as
+    # arrays and unnest() turns them back into rows server-side; a
+    # failure rolls back the whole batch and the task retries
     batch_id = context['dag_run'].run_id
-    loaded_count = 0
-    
-    for product in products:
-        try:
-            cursor.execute("""
-                INSERT INTO raw_products (source, ingestion_time, raw_data, batch_id, processed)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                product.get('source', 'unknown'),
-                datetime.now(),
-                json.dumps(product),
-                batch_id,
-                False
-            ))
-            loaded_count += 1
-        except Exception as e:
-            print(f"Error loading product: {e}")
-            # Continue with other products
+    ingestion_time = datetime.now()
+    sources = [product.get('source', 'unknown') for product in products]
+    raw_data = [Json(product) for product in products]
+    
+    cursor.execute("""
+        INSERT INTO raw_products (source, ingestion_time, raw_data, batch_id, processed)
+        SELECT source, %s, raw_data, %s, FALSE
+        FROM unnest(%s::text[], %s::jsonb[]) AS batch(source, raw_data)
+    """, (ingestion_time, batch_id, sources, raw_data))
+    loaded_count = cursor.rowcount
     
     conn.commit()
     cursor.close()
@@ -126,6 +125,9 @@ def validate_products(**context):
     """
     Task 3: Validate products from raw zone
     Applies quality checks and separates clean vs quarantine
+    
+    Results go to the staging tables (keyed by batch_id) rather than XCom,
+    so product lists never pass through the Airflow metadata DB
     """
     print("Validating products...")
     
@@ -158,7 +160,6 @@ def validate_products(**context):
     
     # Extract products - raw_data is already a dict!
     products = [record[1] for record in raw_records]
-    raw_ids = [record[0] for record in raw_records]
     
     # Validate
     validator = ProductValidator()
@@ -167,11 +168,40 @@ def validate_products(**context):
     # Print validation report
     validator.print_report()
     
-    # Store results in XCom
-    context['task_instance'].xcom_push(key='clean_products', value=clean_products)
-    context['task_instance'].xcom_push(key='quarantined_products', value=quarantined)
+    # Stage results for the load tasks. Clear rows left by a failed
+    # attempt first so retries don't stage the batch twice
+    cursor.execute("DELETE FROM staging_clean_products WHERE batch_id = %s", (batch_id,))
+    cursor.execute("DELETE FROM staging_quarantine_products WHERE batch_id = %s", (batch_id,))
+    
+    execute_values(cursor, """
+        INSERT INTO staging_clean_products 
+        (batch_id, product_id, name, price, stock, source, category)
+        VALUES %s
+    """, [
+        (
+            batch_id,
+            product['product_id'],
+            product['name'],
+            product['price'],
+            product['stock'],
+            product.get('source', 'unknown'),
+            product.get('category', 'Unknown')
+        )
+        for product in clean_products
+    ], page_size=1000)
+    
+    execute_values(cursor, """
+        INSERT INTO staging_quarantine_products (batch_id, raw_data, issues, quarantined_at)
+        VALUES %s
+    """, [
+        (batch_id, Json(item['raw_data']), ', '.join(item['issues']), item['quarantined_at'])
+        for item in quarantined
+    ], page_size=1000)
+    
+    conn.commit()
+    
+    # Only the (small) stats dict goes to XCom
     context['task_instance'].xcom_push(key='validation_stats', value=validator.get_stats())
-    context['task_instance'].xcom_push(key='raw_ids', value=raw_ids)
     
     cursor.close()
     conn.close()
@@ -179,57 +209,67 @@ def validate_products(**context):
     return len(clean_products)
 
 
+def _validated_count(context, key):
+    """Number of products validate_products staged under validation_stats[key]"""
+    stats = context['task_instance'].xcom_pull(
+        task_ids='validate_products',
+        key='validation_stats'
+    )
+    return stats.get(key, 0) if stats else 0
+
+
 def load_to_clean_zone(**context):
     """
     Task 4: Load validated products to clean zone
+    Moves this batch's rows from staging_clean_products in one statement
     """
     print("Loading clean products...")
     
-    # Get clean products from XCom
-    clean_products = context['task_instance'].xcom_pull(
-        task_ids='validate_products',
-        key='clean_products'
+    batch_id = context['task_instance'].xcom_pull(
+        task_ids='load_to_raw_zone',
+        key='batch_id'
     )
     
-    if not clean_products:
-        print("No clean products to load")
-        return 0
-    
     # Get PostgreSQL connection
     pg_hook = PostgresHook(postgres_conn_id='postgres_default')
     conn = pg_hook.get_conn()
     cursor = conn.cursor()
     
-    loaded_count = 0
-    
-    for product in clean_products:
-        try:
-            cursor.execute("""
-                INSERT INTO clean_products 
-                (product_id, name, price, stock, source, category, loaded_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (product_id) DO UPDATE
-                SET price = EXCLUDED.price,
-                    stock = EXCLUDED.stock,
-                    loaded_at = EXCLUDED.loaded_at
-            """, (
-                product['product_id'],
-                product['name'],
-                product['price'],
-                product['stock'],
-                product.get('source', 'unknown'),
-                product.get('category', 'Unknown'),
-                datetime.now()
-            ))
-            loaded_count += 1
-        except Exception as e:
-            print(f"Error loading clean product: {e}")
+    # product_id is unique within a batch (the validator rejects duplicates),
+    # so the ON CONFLICT upsert never updates a row twice
+    cursor.execute("""
+        INSERT INTO clean_products 
+        (product_id, name, price, stock, source, category, loaded_at)
+        SELECT product_id, name, price, stock, source, category, %s
+        FROM staging_clean_products
+        WHERE batch_id = %s
+        ON CONFLICT (product_id) DO UPDATE
+        SET price = EXCLUDED.price,
+            stock = EXCLUDED.stock,
+            loaded_at = EXCLUDED.loaded_at
+    """, (datetime.now(), batch_id))
+    loaded_count = cursor.rowcount
+    
+    expected = _validated_count(context, 'valid')
+    if loaded_count < expected:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        raise ValueError(
+            f"Only {loaded_count} of {expected} clean products staged for {batch_id} "
+            "(staging truncated after a crash?) - re-run from validate_products"
+        )
+    
+    cursor.execute("DELETE FROM staging_clean_products WHERE batch_id = %s", (batch_id,))
     
     conn.commit()
     cursor.close()
     conn.close()
     
-    print(f"Loaded {loaded_count} clean products")
+    if loaded_count:
+        print(f"Loaded {loaded_count} clean products")
+    else:
+        print("No clean products to load")
     
     return loaded_count
 
@@ -237,45 +277,48 @@ def load_to_clean_zone(**context):
 def load_to_quarantine(**context):
     """
     Task 5: Load rejected products to quarantine
+    Moves this batch's rows from staging_quarantine_products in one statement
     """
     print("Loading quarantined products...")
     
-    # Get quarantined products from XCom
-    quarantined = context['task_instance'].xcom_pull(
-        task_ids='validate_products',
-        key='quarantined_products'
+    batch_id = context['task_instance'].xcom_pull(
+        task_ids='load_to_raw_zone',
+        key='batch_id'
     )
     
-    if not quarantined:
-        print("No products to quarantine")
-        return 0
-    
     # Get PostgreSQL connection
     pg_hook = PostgresHook(postgres_conn_id='postgres_default')
     conn = pg_hook.get_conn()
     cursor = conn.cursor()
     
-    loaded_count = 0
-    
-    for item in quarantined:
-        try:
-            cursor.execute("""
-                INSERT INTO quarantine_products (raw_data, issues, quarantined_at)
-                VALUES (%s, %s, %s)
-            """, (
-                json.dumps(item['raw_data']),
-                ', '.join(item['issues']),
-                item['quarantined_at']
-            ))
-            loaded_count += 1
-        except Exception as e:
-            print(f"Error loading quarantine record: {e}")
+    cursor.execute("""
+        INSERT INTO quarantine_products (raw_data, issues, quarantined_at)
+        SELECT raw_data, issues, quarantined_at
+        FROM staging_quarantine_products
+        WHERE batch_id = %s
+    """, (batch_id,))
+    loaded_count = cursor.rowcount
+    
+    expected = _validated_count(context, 'invalid')
+    if loaded_count < expected:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        raise ValueError(
+            f"Only {loaded_count} of {expected} quarantined products staged for {batch_id} "
+            "(staging truncated after a crash?) - re-run from validate_products"
+        )
+    
+    cursor.execute("DELETE FROM staging_quarantine_products WHERE batch_id = %s", (batch_id,))
     
     conn.commit()
     cursor.close()
     conn.close()
     
-    print(f"Quarantined {loaded_count} invalid products")
+    if loaded_count:
+        print(f"Quarantined {loaded_count} invalid products")
+    else:
+        print("No products to quarantine")
     
     return loaded_count
 
@@ -286,27 +329,22 @@ def mark_processed(**context):
     """
     print("Marking records as processed...")
     
-    # Get raw IDs from XCom
-    raw_ids = context['task_instance'].xcom_pull(
-        task_ids='validate_products',
-        key='raw_ids'
+    batch_id = context['task_instance'].xcom_pull(
+        task_ids='load_to_raw_zone',
+        key='batch_id'
     )
     
-    if not raw_ids:
-        print("No IDs to mark")
-        return 0
-    
     # Get PostgreSQL connection
     pg_hook = PostgresHook(postgres_conn_id='postgres_default')
     conn = pg_hook.get_conn()
     cursor = conn.cursor()
     
-    # Mark as processed
+    # Mark as processed (the same rows validate_products selected)
     cursor.execute("""
         UPDATE raw_products
         SET processed = TRUE
-        WHERE id = ANY(%s)
-    """, (raw_ids,))
+        WHERE batch_id = %s AND processed = FALSE
+    """, (batch_id,))
     
     updated = cursor.rowcount
     conn.commit()
@@ -361,6 +399,45 @@ def generate_report(**context):
     return "Report generated"
 
 
+def cleanup_staging(**context):
+    """
+    Task 8: Clear staging rows
+    Teardown for validate_products: runs once the rest of the DAG is done,
+    whatever the outcome, so a failed run doesn't leave its batch staged.
+    As a teardown it doesn't count towards the run's state, so a failed
+    load still fails the run
+    """
+    print("Cleaning up staging tables...")
+    
+    batch_id = context['task_instance'].xcom_pull(
+        task_ids='load_to_raw_zone',
+        key='batch_id'
+    )
+    
+    # Get PostgreSQL connection
+    pg_hook = PostgresHook(postgres_conn_id='postgres_default')
+    conn = pg_hook.get_conn()
+    cursor = conn.cursor()
+    
+    # This run's rows, plus anything left behind by runs that never got here.
+    # The cutoff uses the database clock, the same one that set staged_at
+    removed = 0
+    for table in ('staging_clean_products', 'staging_quarantine_products'):
+        cursor.execute(f"""
+            DELETE FROM {table}
+            WHERE batch_id = %s OR staged_at < now() - %s::interval
+        """, (batch_id, STAGING_RETENTION))
+        removed += cursor.rowcount
+    
+    conn.commit()
+    cursor.close()
+    conn.close()
+    
+    print(f"Removed {removed} staging rows")
+    
+    return removed
+
+
 # Define tasks
 extract_task = PythonOperator(
     task_id='extract_products',
@@ -404,6 +481,13 @@ report_task = PythonOperator(
     dag=dag,
 )
 
+cleanup_staging_task = PythonOperator(
+    task_id='cleanup_staging',
+    python_callable=cleanup_staging,
+    dag=dag,
+)
+
 # Define dependencies
 extract_task >> load_raw_task >> validate_task
-validate_task >> [load_clean_task, load_quarantine_task] >> mark_processed_task >> report_task
\ No newline at end of file
+validate_task >> [load_clean_task, load_quarantine_task] >> mark_processed_task >> report_task
+report_task >> cleanup_staging_task.as_teardown(setups=validate_task)
\ No newline at end of file
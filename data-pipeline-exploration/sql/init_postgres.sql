@@ -27,6 +27,32 @@ CREATE TABLE quarantine_products (
     quarantined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Staging tables: validate_products hands results to the load tasks here
+-- (keyed by batch_id) instead of through Airflow XCom.
+-- UNLOGGED skips WAL, but PostgreSQL truncates these tables after a crash:
+-- a batch staged before a crash is gone, so the load tasks fail (staged
+-- rows < validated count) and the run must be re-run from validate_products.
+-- The DAG's cleanup_staging task clears each run's rows and anything older
+-- than a day left behind by runs that never got that far
+CREATE UNLOGGED TABLE staging_clean_products (
+    batch_id VARCHAR(200) NOT NULL,
+    product_id VARCHAR(50) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    price DECIMAL(10,2),
+    stock INTEGER,
+    source VARCHAR(100),
+    category VARCHAR(100),
+    staged_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE UNLOGGED TABLE staging_quarantine_products (
+    batch_id VARCHAR(200) NOT NULL,
+    raw_data JSONB,
+    issues TEXT,
+    quarantined_at TIMESTAMP,
+    staged_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Insert sample data for exploration
 INSERT INTO raw_products (source, raw_data) VALUES
 ('source_a', '{"product_id": "P001", "name": "Widget", "price": "$19.99", "stock": "10"}'),
@@ -41,7 +67,11 @@ INSERT INTO clean_products (product_id, name, price, stock, source, category) VA
 
 CREATE INDEX idx_raw_products_processed ON raw_products(processed);
 CREATE INDEX idx_raw_products_batch_id ON raw_products(batch_id);
+CREATE INDEX idx_staging_clean_products_batch_id ON staging_clean_products(batch_id);
+CREATE INDEX idx_staging_quarantine_products_batch_id ON staging_quarantine_products(batch_id);
 
 COMMENT ON TABLE raw_products IS 'Landing zone for unprocessed batch data';
 COMMENT ON TABLE clean_products IS 'Validated, cleaned products ready for analytics';
-COMMENT ON TABLE quarantine_products IS 'Invalid records for manual review';
\ No newline at end of file
+COMMENT ON TABLE quarantine_products IS 'Invalid records for manual review';
+COMMENT ON TABLE staging_clean_products IS 'Validated products awaiting load, per batch_id';
+COMMENT ON TABLE staging_quarantine_products IS 'Invalid records awaiting quarantine, per batch_id';
\ No newline at end of file